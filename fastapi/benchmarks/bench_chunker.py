@@ -0,0 +1,108 @@
+"""Compares rag.chunker.chunk_document against the original pure-Python topic assignment.
+
+Usage (from the fastapi directory):
+    python benchmarks/bench_chunker.py [--paragraphs 20000] [--topics 60]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag import chunker
+from rag.chunker import clean_text_for_keywords, chunk_document
+
+
+def reference_assignment(paragraphs, topic_keywords):
+    """The original O(paragraphs x topics) loops from chunk_document."""
+    n_topics = len(topic_keywords)
+    topic_passages = {i: [] for i in range(n_topics)}
+    unassigned = []
+    for idx, passage in enumerate(paragraphs):
+        passage_words = clean_text_for_keywords(passage)
+        best_topic_idx = -1
+        max_matches = 0
+        for t_idx, keywords in enumerate(topic_keywords):
+            matches = len(passage_words.intersection(keywords))
+            if matches > max_matches:
+                max_matches = matches
+                best_topic_idx = t_idx
+        if best_topic_idx != -1:
+            topic_passages[best_topic_idx].append(passage)
+        else:
+            unassigned.append((idx, passage))
+    for idx, passage in unassigned:
+        closest_topic_idx = 0
+        min_distance = float('inf')
+        for t_idx in range(n_topics):
+            target_pos = (t_idx / n_topics) * len(paragraphs)
+            dist = abs(idx - target_pos)
+            if dist < min_distance:
+                min_distance = dist
+                closest_topic_idx = t_idx
+        topic_passages[closest_topic_idx].append(passage)
+    return topic_passages
+
+
+def vectorized_assignment(paragraphs, topic_keywords):
+    assignment, matched = chunker.assign_passages_to_topics(paragraphs, topic_keywords)
+    topic_passages = {i: [] for i in range(len(topic_keywords))}
+    for idx in [i for i in range(len(paragraphs)) if matched[i]]:
+        topic_passages[int(assignment[idx])].append(paragraphs[idx])
+    for idx in [i for i in range(len(paragraphs)) if not matched[i]]:
+        topic_passages[int(assignment[idx])].append(paragraphs[idx])
+    return topic_passages
+
+
+def synthetic_document(n_paragraphs, n_topics, seed=7):
+    rng = random.Random(seed)
+    vocabulary = [f"term{chr(97 + i % 26)}{i}" for i in range(3000)]
+    filler = ["lorem", "ipsum", "dolor", "amet", "consectetur", "adipiscing", "elit"]
+    topics = []
+    for t in range(n_topics):
+        words = rng.sample(vocabulary, 8)
+        topics.append({
+            "title": " ".join(words[:3]),
+            "summary": " ".join(words[3:]),
+            "unitIndex": t // 10,
+            "topicIndex": t % 10,
+        })
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        # Roughly a third of paragraphs share no keyword with any topic
+        pool = filler if rng.random() < 0.35 else vocabulary
+        paragraphs.append(" ".join(rng.choice(pool) for _ in range(rng.randint(20, 80))))
+    return "\n".join(paragraphs), topics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=60)
+    args = parser.parse_args()
+
+    text, topics = synthetic_document(args.paragraphs, args.topics)
+    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    topic_keywords = [clean_text_for_keywords(t["title"] + " " + t["summary"]) for t in topics]
+
+    started = time.perf_counter()
+    expected = reference_assignment(paragraphs, topic_keywords)
+    reference_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = vectorized_assignment(paragraphs, topic_keywords)
+    vectorized_seconds = time.perf_counter() - started
+
+    assert actual == expected, "vectorized assignment differs from the reference implementation"
+
+    started = time.perf_counter()
+    chunks = chunk_document(text, topics, "bench")
+    chunk_seconds = time.perf_counter() - started
+
+    print(f"{len(paragraphs)} paragraphs x {len(topics)} topics")
+    print(f"  reference assignment:  {reference_seconds * 1000:8.1f} ms")
+    print(f"  vectorized assignment: {vectorized_seconds * 1000:8.1f} ms "
+          f"({reference_seconds / vectorized_seconds:.1f}x faster, identical output)")
+    print(f"  chunk_document total:  {chunk_seconds * 1000:8.1f} ms, {len(chunks)} chunks")
@@ -1,29 +1,56 @@
 import os
 import json
-import fitz  # PyMuPDF
-from PIL import Image
+import asyncio
+import hashlib
 from dotenv import load_dotenv
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import google.generativeai as genai
-from groq import Groq
 
 import re
 
+from services.cache import TieredCache, file_sha256
+from services.tfidf_index import TfidfIndex
+from services.pdf_pipeline import (
+    PIPELINE_VERSION,
+    build_document,
+    iter_chunks,
+    text_prefix_from_chunks,
+)
+from services.llm_client import (
+    GEMINI_VISION_MODEL,
+    GROQ_FALLBACK_MODEL,
+    GROQ_PRIMARY_MODEL,
+    LLM_PROVIDER,
+    get_llm_client,
+)
+from services.ocr import extract_syllabus_text
+
 # Load environment variables
 load_dotenv()
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_PROVIDER != "fake":
     raise ValueError("GEMINI_API_KEY not found in environment variables")
 
-if not GROQ_API_KEY:
+if not GROQ_API_KEY and LLM_PROVIDER != "fake":
     raise ValueError("GROQ_API_KEY not found in environment variables")
 
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_vision_model = genai.GenerativeModel("gemini-3.5-flash")
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Content-addressed cache of parsed PDFs, shared by /getRoadmap and /explainTopic
+PDF_CACHE_MEMORY_ITEMS = int(os.environ.get("PDF_CACHE_MEMORY_ITEMS", "32"))
+PDF_CACHE_DISK_MB = int(os.environ.get("PDF_CACHE_DISK_MB", "512"))
+pdf_cache = TieredCache("pdf", PDF_CACHE_MEMORY_ITEMS, PDF_CACHE_DISK_MB * 1024 * 1024)
+tfidf_cache = TieredCache("tfidf", PDF_CACHE_MEMORY_ITEMS, PDF_CACHE_DISK_MB * 1024 * 1024)
+
+# Finished roadmaps, keyed by input content hashes, prompt version and model
+# Bump ROADMAP_PROMPT_VERSION whenever the roadmap prompts or output shape change
+ROADMAP_PROMPT_VERSION = "1"
+ROADMAP_CACHE_ENABLED = os.environ.get("ROADMAP_CACHE_ENABLED", "true").lower() == "true"
+ROADMAP_CACHE_TTL_SECONDS = float(os.environ.get("ROADMAP_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ROADMAP_CACHE_MEMORY_ITEMS = int(os.environ.get("ROADMAP_CACHE_MEMORY_ITEMS", "64"))
+ROADMAP_CACHE_DISK_MB = int(os.environ.get("ROADMAP_CACHE_DISK_MB", "64"))
+roadmap_cache = TieredCache(
+    "roadmap", ROADMAP_CACHE_MEMORY_ITEMS, ROADMAP_CACHE_DISK_MB * 1024 * 1024,
+    ttl_seconds=ROADMAP_CACHE_TTL_SECONDS,
+)
 
 
 def create_text_prompt(system_prompt, user_prompt):
@@ -33,51 +60,41 @@ def create_text_prompt(system_prompt, user_prompt):
     ]
 
 
-def generate_groq_text(system_prompt, user_prompt, temperature=0.2, max_tokens=1024):
-    try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=create_text_prompt(system_prompt, user_prompt),
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return (response.choices[0].message.content or "").strip()
-    except Exception as e:
-        print(f"[WARN] Groq primary model failed: {e}. Trying fallback model llama-3.1-8b-instant...")
-        try:
-            response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=create_text_prompt(system_prompt, user_prompt),
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            return (response.choices[0].message.content or "").strip()
-        except Exception as e_fallback:
-            print(f"[ERROR] Both Groq models failed: {e_fallback}")
-            raise e_fallback
+async def generate_groq_text(system_prompt, user_prompt, temperature=0.2, max_tokens=1024):
+    """Runs a chat completion through the shared LLM client (primary model with fallback)."""
+    return await get_llm_client().complete(
+        create_text_prompt(system_prompt, user_prompt),
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
 
 # --- 1. Text Extraction ---
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF file."""
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-def extract_syllabus_from_image(image_path):
-    """Extracts syllabus text from an image using Gemini vision."""
+def _document_cache_key(sha256):
+    return f"v{PIPELINE_VERSION}-{sha256}"
+
+def load_pdf_document(pdf_path):
+    """Returns the chunks and page metadata of a PDF, cached by content hash.
+
+    The page -> text -> chunk pipeline streams, so the full document text is
+    never held in memory; only the chunks (with their page ranges) are kept.
+    """
+    sha256 = file_sha256(pdf_path)
+    document = pdf_cache.get(_document_cache_key(sha256))
+    if document is not None:
+        print(f"PDF cache hit for {sha256[:12]}.")
+        return document
+
+    document = {"sha256": sha256, **build_document(pdf_path)}
+    pdf_cache.set(_document_cache_key(sha256), document)
+    return document
+
+async def extract_syllabus_from_image(image_path):
+    """Extracts syllabus text from an image (downscaled, OCR cached by content hash)."""
     try:
         if not image_path or not os.path.exists(image_path):
             return ""
 
-        image = Image.open(image_path)
-        prompt = (
-            "Extract all visible syllabus text from this image. "
-            "Return only the plain extracted text with no explanation, bullets, or markdown."
-        )
-        response = gemini_vision_model.generate_content([prompt, image])
-        text = (getattr(response, "text", "") or "").strip()
+        text = await extract_syllabus_text(image_path)
         return text if text else "Default Syllabus: General Computer Science"
     except Exception as e:
         print(f"Error extracting syllabus: {e}")
@@ -88,36 +105,26 @@ def chunk_text(text):
     """Splits text into semantic chunks."""
     if not text:
         return []
-
-    chunk_size = 1000
-    chunk_overlap = 200
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunks.append(text[start:end])
-        if end >= len(text):
-            break
-        start = max(0, end - chunk_overlap)
-    return chunks
+    return [chunk["text"] for chunk in iter_chunks([(1, text)])]
 
 # --- 3. TF-IDF Retrieval ---
-def retrieve_relevant_chunks(chunks, query, top_k=5):
+def get_tfidf_index(document):
+    """Returns the TF-IDF index for a cached PDF document, building and persisting it on first use."""
+    key = _document_cache_key(document["sha256"])
+    index = tfidf_cache.get(key)
+    if index is None:
+        index = TfidfIndex.build(document["chunks"])
+        tfidf_cache.set(key, index)
+    return index
+
+def retrieve_relevant_chunks(chunks, query, top_k=5, index=None):
     """Retrieves top_k chunks relevant to the query using TF-IDF."""
     if not chunks:
         return []
-        
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(chunks + [query])
-    
-    # Calculate cosine similarity between the query (last vector) and all chunks
-    cosine_similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
-    
-    # Get indices of top_k most similar chunks
-    related_docs_indices = cosine_similarities.argsort()[0][-top_k:][::-1]
-    
-    relevant_chunks = [chunks[i] for i in related_docs_indices]
-    return relevant_chunks
+
+    if index is None:
+        index = TfidfIndex.build(chunks)
+    return [chunks[i] for i, _ in index.query(query, top_k)]
 
 def extract_json_from_text(text):
     """Tries multiple strategies to extract a JSON object from LLM output."""
@@ -139,19 +146,32 @@ def extract_json_from_text(text):
     return None
 
 
-def generate_topic_explanation(pdf_path, topic_title, topic_summary):
+def is_image_path(path):
+    return bool(path) and any(path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
+
+async def build_topic_context(pdf_path, topic_title, topic_summary, document=None, syllabus_text=None):
+    """Builds the study-material context for a topic.
+
+    Callers explaining several topics from one upload pass the already loaded
+    document (or extracted syllabus text) so the file is only processed once.
+    """
+    if syllabus_text is not None:
+        return syllabus_text
+    if not pdf_path or not os.path.exists(pdf_path):
+        return ""
+    if is_image_path(pdf_path):
+        return await extract_syllabus_from_image(pdf_path)
+
+    if document is None:
+        document = await asyncio.to_thread(load_pdf_document, pdf_path)
+    index = await asyncio.to_thread(get_tfidf_index, document)
+    query = f"{topic_title}: {topic_summary}"
+    relevant_chunks = retrieve_relevant_chunks(document["chunks"], query, top_k=10, index=index)
+    return "\n\n".join(relevant_chunks)
+
+async def generate_topic_explanation(pdf_path, topic_title, topic_summary, document=None, syllabus_text=None):
     """Generates explanation for a specific topic with retry on parse failure."""
-    is_image = pdf_path and any(pdf_path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
-    
-    context = ""
-    if pdf_path and os.path.exists(pdf_path) and not is_image:
-        pdf_text = extract_text_from_pdf(pdf_path)
-        chunks = chunk_text(pdf_text)
-        query = f"{topic_title}: {topic_summary}"
-        relevant_chunks = retrieve_relevant_chunks(chunks, query, top_k=10)
-        context = "\n\n".join(relevant_chunks)
-    elif is_image and pdf_path and os.path.exists(pdf_path):
-        context = extract_syllabus_from_image(pdf_path)
+    context = await build_topic_context(pdf_path, topic_title, topic_summary, document, syllabus_text)
 
     system_prompt = (
         "You are an expert tutor. Your ONLY output must be a single valid JSON object with NO extra text, "
@@ -171,13 +191,13 @@ def generate_topic_explanation(pdf_path, topic_title, topic_summary):
         )
 
     # Attempt 1
-    raw = generate_groq_text(system_prompt, build_user_prompt(), temperature=0.3)
+    raw = await generate_groq_text(system_prompt, build_user_prompt(), temperature=0.3)
     parsed = extract_json_from_text(raw)
 
     # Attempt 2 with lower temperature if first failed
     if parsed is None:
         print(f"[WARN] First parse attempt failed for '{topic_title}'. Retrying...")
-        raw = generate_groq_text(system_prompt, build_user_prompt(), temperature=0.1)
+        raw = await generate_groq_text(system_prompt, build_user_prompt(), temperature=0.1)
         parsed = extract_json_from_text(raw)
 
     if parsed is None:
@@ -193,45 +213,86 @@ def generate_topic_explanation(pdf_path, topic_title, topic_summary):
     return parsed
 
 # --- Main Workflow ---
-def generate_study_plan(pdf_path=None, syllabus_image_path=None):
+def report_step(progress, step, message):
+    print(f"--- Step {step}: {message} ---")
+    if progress:
+        progress(step, message)
+
+def roadmap_cache_key(pdf_path=None, syllabus_image_path=None):
+    """Key of a roadmap: hashes of both inputs plus the prompt, pipeline and model versions that produce it.
+
+    Also the dedupe key of background roadmap jobs.
+    """
+    parts = [
+        f"p{ROADMAP_PROMPT_VERSION}", f"v{PIPELINE_VERSION}",
+        GROQ_PRIMARY_MODEL, GROQ_FALLBACK_MODEL, GEMINI_VISION_MODEL,
+    ]
+    for path in (pdf_path, syllabus_image_path):
+        parts.append(file_sha256(path) if path and os.path.exists(path) else "-")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+async def generate_study_plan(pdf_path=None, syllabus_image_path=None, progress=None,
+                              use_cache=True, force_refresh=False):
+    """Returns the study roadmap for the inputs, served from the roadmap cache when possible.
+
+    use_cache=False bypasses the cache entirely; force_refresh=True regenerates
+    and overwrites the cached roadmap. progress, if given, is called as
+    progress(step, message) at each stage.
+    """
+    use_cache = use_cache and ROADMAP_CACHE_ENABLED
+    if not use_cache:
+        return await build_study_plan(pdf_path, syllabus_image_path, progress)
+
+    key = await asyncio.to_thread(roadmap_cache_key, pdf_path, syllabus_image_path)
+    if not force_refresh:
+        cached = roadmap_cache.get(key)
+        if cached is not None:
+            report_step(progress, 0, "Roadmap cache hit")
+            return cached
+
+    roadmap = await build_study_plan(pdf_path, syllabus_image_path, progress)
+    # An empty roadmap means the model output could not be parsed; don't pin it
+    if roadmap:
+        roadmap_cache.set(key, roadmap)
+    return roadmap
+
+async def build_study_plan(pdf_path=None, syllabus_image_path=None, progress=None):
     """Orchestrates the full pipeline."""
     
     # Check if pdf_path is actually an image (syllabus)
-    is_pdf_image = False
-    if pdf_path and any(pdf_path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg']):
-        is_pdf_image = True
+    is_pdf_image = is_image_path(pdf_path)
 
     # 1. Text Extraction
-    pdf_text = ""
+    chunks = []
     if pdf_path and os.path.exists(pdf_path) and not is_pdf_image:
-        print("--- Step 1: Extracting text from PDF ---")
-        pdf_text = extract_text_from_pdf(pdf_path)
-        print(f"Extracted {len(pdf_text)} characters from PDF.")
+        report_step(progress, 1, "Extracting text from PDF")
+        document = await asyncio.to_thread(load_pdf_document, pdf_path)
+        chunks = document["chunks"]
+        print(f"Extracted {document['char_count']} characters from {document['page_count']} PDF pages.")
     else:
-        print("--- Step 1: No PDF notes provided or notes file missing/skipped ---")
+        report_step(progress, 1, "No PDF notes provided or notes file missing/skipped")
     
     syllabus_text = ""
     if is_pdf_image:
-        print("--- Step 2: Extracting syllabus from primary image ---")
-        syllabus_text = extract_syllabus_from_image(pdf_path)
+        report_step(progress, 2, "Extracting syllabus from primary image")
+        syllabus_text = await extract_syllabus_from_image(pdf_path)
     elif syllabus_image_path and os.path.exists(syllabus_image_path):
-        print("--- Step 2: Extracting syllabus from helper image ---")
-        syllabus_text = extract_syllabus_from_image(syllabus_image_path)
+        report_step(progress, 2, "Extracting syllabus from helper image")
+        syllabus_text = await extract_syllabus_from_image(syllabus_image_path)
     else:
-        print("--- Step 2: No syllabus image provided or file missing ---")
+        report_step(progress, 2, "No syllabus image provided or file missing")
 
     print(f"Syllabus text: {syllabus_text[:100]}...")
     
     # 2. Chunking
     context = ""
-    if pdf_text:
-        print("--- Step 3: Chunking text ---")
-        chunks = chunk_text(pdf_text)
+    if chunks:
+        report_step(progress, 3, "Chunking text")
         print(f"Created {len(chunks)} chunks.")
-        context = pdf_text[:8000]
+        context = text_prefix_from_chunks(chunks, 8000)
     
     # 4. Generate
-    print("--- Step 5: Generating roadmap with Groq ---")
+    report_step(progress, 5, "Generating roadmap with Groq")
     system_prompt = (
         "You are an expert study planner. Create a detailed study roadmap in valid JSON only. "
         "Return an array of units, each containing a unit number and a topics array with title and summary."
@@ -262,7 +323,7 @@ def generate_study_plan(pdf_path=None, syllabus_image_path=None):
             "Return the roadmap organized into 5 units."
         )
 
-    result = generate_groq_text(system_prompt, user_prompt, temperature=0.2)
+    result = await generate_groq_text(system_prompt, user_prompt, temperature=0.2)
     
     # Parse JSON
     try:
@@ -301,6 +362,6 @@ if __name__ == "__main__":
     syllabus_file = os.path.join(raw_data_path, "syllabus.jpg")
     
     if os.path.exists(pdf_file):
-        generate_study_plan(pdf_file, syllabus_file)
+        asyncio.run(generate_study_plan(pdf_file, syllabus_file))
     else:
         print("Test PDF not found.")
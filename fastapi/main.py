@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from dotenv import load_dotenv
@@ -8,12 +9,16 @@ import sys
 import io
 import logging
 import asyncio
+import json
 import urllib.request
 
 # Add current directory to path for sub-module loading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from rag.doubt_solver import solve_doubt_stream
+from rag.doubt_solver import DOUBT_MAX_TOKENS, solve_doubt_stream
+from services.llm_client import close_llm_client
+from services.memory import PeakRSSTracker
+from services.sse import StreamMetrics, stream_tokens_as_sse
 
 # Initialize FastAPI app
 app = FastAPI(title="AdeptAi AI Engine")
@@ -43,6 +48,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoints whose peak memory is logged and returned in X-Peak-RSS-MB
+MEMORY_TRACKED_PATHS = {"/getRoadmap", "/explainTopic", "/explainTopics", "/ingest-document"}
+
+@app.middleware("http")
+async def report_peak_rss(request: Request, call_next):
+    if request.url.path not in MEMORY_TRACKED_PATHS:
+        return await call_next(request)
+    tracker = PeakRSSTracker().start()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        tracker.stop()
+        raise
+    # The header can only carry the peak up to the response head; the log line
+    # covers the whole body, which matters for streamed responses
+    response.headers["X-Peak-RSS-MB"] = f"{tracker.peak / (1024 * 1024):.1f}"
+    body = response.body_iterator
+
+    async def tracked_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            peak = await asyncio.to_thread(tracker.stop)
+            logging.getLogger("main").info(
+                f"{request.url.path}: peak RSS {peak / (1024 * 1024):.1f} MB "
+                f"(start {tracker.start_rss / (1024 * 1024):.1f} MB, including worker processes)"
+            )
+
+    response.body_iterator = tracked_body()
+    return response
+
 def ping_url(url: str):
     try:
         with urllib.request.urlopen(url, timeout=5.0) as response:
@@ -72,9 +109,18 @@ async def self_ping_loop():
 
 @app.on_event("startup")
 async def startup_event():
+    # Jobs left running by a previous process lost their temp inputs
+    job_store.fail_interrupted()
     # Register the self-ping loop task
     asyncio.create_task(self_ping_loop())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Release pooled LLM connections and PDF parsing workers
+    await close_llm_client()
+    from services.pdf_pipeline import shutdown_pdf_pool
+    shutdown_pdf_pool()
+
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(BASE_DIR)
@@ -91,7 +137,7 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
+from services.classroom_sync import ClassroomSync
 
 final_path = raw_data_path
 
@@ -127,130 +173,19 @@ def init_google_credentials(userId: Optional[str] = None):
     except Exception as err:
         return err
 
-def downloadFile(drive_service, fileName, fileId, userId: Optional[str] = None):
-    print("NOTES download begin")
-    request = drive_service.files().get_media(fileId=fileId)
-    print("../")
-    target_filename = f"{userId}_{fileName}" if userId else fileName
-    fh = io.FileIO(os.path.join(final_path, target_filename), 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-
-    done = False
-    while done is False:
-        status, done = downloader.next_chunk()
-        print(f"  🔽 Downloaded {int(status.progress() * 100)}%")
-    print("NOTES download done")
-
-def isPresent(fileName, userId: Optional[str] = None):
-    target_filename = f"{userId}_{fileName}" if userId else fileName
-    return os.path.exists(os.path.join(final_path, target_filename))
-
 def sync_classroom_notes(userId: Optional[str] = None):
+    """Incrementally syncs Classroom announcement attachments into rawData; returns sync stats."""
     try:
         creds = init_google_credentials(userId)
         if isinstance(creds, Exception):
             raise creds
-        service = build("classroom", "v1", credentials=creds)
-        drive_service = build("drive", "v3", credentials=creds)
-
-        # Call the Classroom API
-        results = service.courses().list().execute()
-        courses = results.get("courses", [])
-
-        print("Got the Courses")
-        if not courses:
-            print("No courses found.")
-            return True
-        print("Courses:")
-        for course in courses:
-            course_id = course["id"]
-            print(course["name"])
-            announcements = service.courses().announcements().list(courseId=course_id).execute()
-            items = announcements.get('announcements', [])
-            print("Got the announcements")
-            for item in items:
-                for material in item.get("materials", []):
-                    if "driveFile" in material:
-                        print("Got the files")
-                        fileInfo = material["driveFile"]["driveFile"]
-                        fileId = fileInfo["id"]
-                        fileName = fileInfo["title"]
-
-                        if not isPresent(fileName, userId):
-                            downloadFile(drive_service, fileName, fileId, userId)
-                            print("File Downloaded")
-                        else:
-                            print(f'{fileName} skipped as it is already installed!')
-        return True
+        return ClassroomSync(creds, final_path, userId).run()
     except Exception as err:
         print(err)
         raise err
 
 # YouTube Integration
-YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
-
-def search_youtube_videos(query, max_results=3):
-    """Searches for YouTube videos related to the query."""
-    if not YOUTUBE_API_KEY:
-        print("YOUTUBE_API_KEY not found.")
-        return []
-        
-    try:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-        
-        search_response = youtube.search().list(
-            q=query,
-            type="video",
-            part="id,snippet",
-            maxResults=max_results,
-            relevanceLanguage="en"
-        ).execute()
-        
-        videos = []
-        for search_result in search_response.get("items", []):
-            video_id = search_result["id"]["videoId"]
-            
-            # Get video details for duration and view count
-            video_response = youtube.videos().list(
-                id=video_id,
-                part="contentDetails,statistics"
-            ).execute()
-            
-            if not video_response.get("items"):
-                continue
-                
-            video_details = video_response["items"][0]
-            duration = video_details["contentDetails"]["duration"] # ISO 8601 format (e.g., PT15M33S)
-            view_count = video_details["statistics"].get("viewCount", "0")
-            
-            # Format duration (simple approximation)
-            duration = duration.replace("PT", "").replace("H", ":").replace("M", ":").replace("S", "")
-            if ":" not in duration: # If only seconds
-                duration = f"0:{duration}"
-            
-            # Format view count
-            try:
-                views = int(view_count)
-                if views >= 1000000:
-                    view_count = f"{views/1000000:.1f}M"
-                elif views >= 1000:
-                    view_count = f"{views/1000:.1f}K"
-            except:
-                pass
-
-            videos.append({
-                "videoId": video_id,
-                "title": search_result["snippet"]["title"],
-                "thumbnail": search_result["snippet"]["thumbnails"]["medium"]["url"],
-                "channelName": search_result["snippet"]["channelTitle"],
-                "duration": duration,
-                "viewCount": f"{view_count} views"
-            })
-            
-        return videos
-    except Exception as e:
-        print(f"Error searching YouTube: {e}")
-        return []
+from services.youtube_service import search_youtube_videos, youtube_cache_stats
 
 # Pydantic request models
 class ExplainTopicRequest(BaseModel):
@@ -260,15 +195,32 @@ class ExplainTopicRequest(BaseModel):
 
 # Routes
 @app.get("/")
-def hello_world():
+async def hello_world():
     return {"Res": 200}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    from rag.embedder import embedding_cache_stats
+    from rag.answer_cache import answer_cache
+    from gemini_advanced import roadmap_cache
+    from services.tavily_service import web_search_cache_stats
+    from rag.faq import faq_stats
+    return {
+        "embeddingCache": embedding_cache_stats(),
+        "answerCache": answer_cache.stats(),
+        "roadmapCache": roadmap_cache.stats(),
+        "youtubeCache": youtube_cache_stats(),
+        "webSearchCache": web_search_cache_stats(),
+        "doubtStreams": doubt_stream_metrics.stats(),
+        "faq": faq_stats(),
+    }
+
 @app.get("/deleteToken")
-def delete_token(userId: Optional[str] = None):
+async def delete_token(userId: Optional[str] = None):
     try:
         token_filename = f"token_{userId}.json" if userId else "token.json"
         if os.path.exists(token_filename):
@@ -279,10 +231,10 @@ def delete_token(userId: Optional[str] = None):
         raise HTTPException(status_code=404, detail="Error in deleting token")
 
 @app.get("/getNotes")
-def get_notes(userId: Optional[str] = None):
+async def get_notes(userId: Optional[str] = None):
     try:
-        sync_classroom_notes(userId)
-        return {"statusCode": 200, "body": "Successfully installed notes"}
+        stats = await asyncio.to_thread(sync_classroom_notes, userId)
+        return {"statusCode": 200, "body": "Successfully installed notes", "stats": stats}
     except Exception as err:
         raise HTTPException(status_code=404, detail="Error in installing notes")
 
@@ -290,57 +242,114 @@ from fastapi import File, UploadFile, Form
 import tempfile
 import shutil
 
+def save_upload_to_temp(upload: UploadFile) -> str:
+    suffix = os.path.splitext(upload.filename or "")[1]
+    temp_fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(temp_fd, 'wb') as f:
+        shutil.copyfileobj(upload.file, f)
+    return temp_path
+
+from services.job_store import JobStore, TERMINAL_STATUSES
+from services.roadmap_jobs import RoadmapJobQueue
+
+job_store = JobStore()
+roadmap_jobs = RoadmapJobQueue(job_store)
+
+def remove_temp_files(paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+class TempFileStreamingResponse(StreamingResponse):
+    """StreamingResponse that removes temp files once sent, also when the client disconnects
+    before the body starts (when neither the generator nor a background task would run)."""
+
+    def __init__(self, content, temp_paths: list, **kwargs):
+        super().__init__(content, **kwargs)
+        self.temp_paths = temp_paths
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            remove_temp_files(self.temp_paths)
+
+async def prepare_roadmap_inputs(userId, pdf_file, syllabus_file):
+    """Resolves the notes PDF and syllabus image for a roadmap request.
+
+    Returns (pdf_path, syllabus_path, owned_paths) where owned_paths are the
+    temp copies of uploads that must be deleted afterwards.
+    """
+    temp_pdf_path = None
+    temp_syllabus_path = None
+    owned_paths = []
+
+    # 1. Handle PDF / Notes
+    if pdf_file and pdf_file.filename:
+        temp_pdf_path = await asyncio.to_thread(save_upload_to_temp, pdf_file)
+        owned_paths.append(temp_pdf_path)
+    elif userId:
+        # Fallback: Find the first PDF file for the user on Python's local disk (synced from classroom)
+        suffix = f"{userId}_"
+        for f in os.listdir(raw_data_path):
+            if f.startswith(suffix) and f.endswith(".pdf"):
+                temp_pdf_path = os.path.join(raw_data_path, f)
+                break
+
+    # 2. Handle Syllabus
+    if syllabus_file and syllabus_file.filename:
+        temp_syllabus_path = await asyncio.to_thread(save_upload_to_temp, syllabus_file)
+        owned_paths.append(temp_syllabus_path)
+    
+    # Check if the primary file is an image (syllabus) or a PDF (notes)
+    is_primary_image = temp_pdf_path and any(temp_pdf_path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
+    if is_primary_image and not temp_syllabus_path:
+        temp_syllabus_path = temp_pdf_path
+        temp_pdf_path = None
+
+    if not temp_pdf_path and not temp_syllabus_path:
+        remove_temp_files(owned_paths)
+        raise HTTPException(status_code=400, detail="No study materials or syllabus image found to generate a roadmap.")
+    return temp_pdf_path, temp_syllabus_path, owned_paths
+
 @app.post("/getRoadmap")
-def get_roadmap(
+async def get_roadmap(
     userId: Optional[str] = Form(None),
     pdf_file: Optional[UploadFile] = File(None),
-    syllabus_file: Optional[UploadFile] = File(None)
+    syllabus_file: Optional[UploadFile] = File(None),
+    asyncMode: bool = Form(False),
+    useCache: bool = Form(True),
+    forceRefresh: bool = Form(False)
 ):
-    try:
-        temp_pdf_path = None
-        temp_syllabus_path = None
-        
-        # 1. Handle PDF / Notes
-        if pdf_file and pdf_file.filename:
-            suffix = os.path.splitext(pdf_file.filename)[1]
-            temp_pdf_fd, temp_pdf_path = tempfile.mkstemp(suffix=suffix)
-            with os.fdopen(temp_pdf_fd, 'wb') as f:
-                shutil.copyfileobj(pdf_file.file, f)
-        elif userId:
-            # Fallback: Find the first PDF file for the user on Python's local disk (synced from classroom)
-            suffix = f"{userId}_"
-            for f in os.listdir(raw_data_path):
-                if f.startswith(suffix) and f.endswith(".pdf"):
-                    temp_pdf_path = os.path.join(raw_data_path, f)
-                    break
-
-        # 2. Handle Syllabus
-        if syllabus_file and syllabus_file.filename:
-            suffix = os.path.splitext(syllabus_file.filename)[1]
-            temp_syllabus_fd, temp_syllabus_path = tempfile.mkstemp(suffix=suffix)
-            with os.fdopen(temp_syllabus_fd, 'wb') as f:
-                shutil.copyfileobj(syllabus_file.file, f)
-        
-        # Check if the primary file is an image (syllabus) or a PDF (notes)
-        is_primary_image = temp_pdf_path and any(temp_pdf_path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
-        if is_primary_image and not temp_syllabus_path:
-            temp_syllabus_path = temp_pdf_path
-            temp_pdf_path = None
+    """Generates a roadmap inline, or with asyncMode queues a background job and returns its id.
 
-        if not temp_pdf_path and not temp_syllabus_path:
-            raise HTTPException(status_code=400, detail="No study materials or syllabus image found to generate a roadmap.")
+    Roadmaps are cached by input content; useCache=false skips the cache and
+    forceRefresh=true regenerates and replaces the cached roadmap.
+    """
+    owned_paths = []
+    try:
+        temp_pdf_path, temp_syllabus_path, owned_paths = await prepare_roadmap_inputs(userId, pdf_file, syllabus_file)
+
+        if asyncMode:
+            job, created = await roadmap_jobs.submit(
+                temp_pdf_path, temp_syllabus_path, owned_paths,
+                use_cache=useCache, force_refresh=forceRefresh,
+            )
+            owned_paths = []  # the job owns the temp files now
+            return JSONResponse(status_code=202, content={
+                "message": "Roadmap job queued" if created else "Identical roadmap job already exists",
+                "jobId": job["id"],
+                "status": job["status"],
+                "deduplicated": not created
+            })
 
         # Use the new advanced pipeline
         from gemini_advanced import generate_study_plan
         target_name = os.path.basename(temp_pdf_path) if temp_pdf_path else os.path.basename(temp_syllabus_path)
         print(f"Starting Advanced LangChain Pipeline for: {target_name}")
-        result = generate_study_plan(temp_pdf_path, temp_syllabus_path)
-        
-        # Cleanup temp files
-        if pdf_file and temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
-        if syllabus_file and temp_syllabus_path and os.path.exists(temp_syllabus_path):
-            os.remove(temp_syllabus_path)
+        result = await generate_study_plan(
+            temp_pdf_path, temp_syllabus_path, use_cache=useCache, force_refresh=forceRefresh
+        )
             
         return {"message": "Roadmap generated successfully", "body": result}
     except HTTPException as he:
@@ -349,9 +358,64 @@ def get_roadmap(
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        remove_temp_files(owned_paths)
+
+def job_status_payload(job: dict) -> dict:
+    return {
+        "jobId": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "events": job["events"],
+        "error": job["error"],
+        "createdAt": job["created_at"],
+        "updatedAt": job["updated_at"]
+    }
+
+@app.get("/roadmapJobs/{job_id}")
+async def get_roadmap_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status_payload(job)
+
+@app.get("/roadmapJobs/{job_id}/result")
+async def get_roadmap_job_result(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Roadmap job failed")
+    if job["status"] != "succeeded":
+        return JSONResponse(status_code=202, content=job_status_payload(job))
+    return {"message": "Roadmap generated successfully", "body": job["result"]}
+
+@app.get("/roadmapJobs/{job_id}/events")
+async def roadmap_job_events(job_id: str, req: Request):
+    """Streams a job's progress events as SSE until it succeeds or fails."""
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_generator():
+        sent = 0
+        while not await req.is_disconnected():
+            job = job_store.get(job_id)
+            for event in job["events"][sent:]:
+                yield f"data: {json.dumps(event)}\n\n"
+            sent = len(job["events"])
+            if job["status"] in TERMINAL_STATUSES:
+                yield f"data: {json.dumps({'status': job['status'], 'error': job['error']})}\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/explainTopic")
-def explain_topic(
+async def explain_topic(
     topicTitle: str = Form(...),
     topicSummary: Optional[str] = Form(None),
     pdf_file: UploadFile = File(...)
@@ -359,23 +423,19 @@ def explain_topic(
     temp_pdf_path = None
     try:
         # Handle PDF
-        suffix = os.path.splitext(pdf_file.filename)[1]
-        temp_pdf_fd, temp_pdf_path = tempfile.mkstemp(suffix=suffix)
-        with os.fdopen(temp_pdf_fd, 'wb') as f:
-            shutil.copyfileobj(pdf_file.file, f)
-            
-        # 1. Generate Explanation using Gemini
+        temp_pdf_path = await asyncio.to_thread(save_upload_to_temp, pdf_file)
+
+        # Generate the explanation and fetch YouTube videos concurrently
         from gemini_advanced import generate_topic_explanation
-        print(f"Generating explanation for: {topicTitle}")
-        explanation = generate_topic_explanation(temp_pdf_path, topicTitle, topicSummary)
-        
+        print(f"Generating explanation and fetching YouTube videos for: {topicTitle}")
+        youtube_query = f"{topicTitle} tutorial explained"
+        explanation, videos = await asyncio.gather(
+            generate_topic_explanation(temp_pdf_path, topicTitle, topicSummary),
+            asyncio.to_thread(search_youtube_videos, youtube_query),
+        )
+
         if explanation is None:
             raise HTTPException(status_code=422, detail="Failed to generate explanation after retries. Please try again.")
-
-        # 2. Fetch YouTube Videos
-        print(f"Fetching YouTube videos for: {topicTitle}")
-        youtube_query = f"{topicTitle} tutorial explained"
-        videos = search_youtube_videos(youtube_query)
         
         return {
             "explanation": explanation,
@@ -392,51 +452,163 @@ def explain_topic(
             os.remove(temp_pdf_path)
 
 
+EXPLAIN_TOPICS_CONCURRENCY = int(os.environ.get("EXPLAIN_TOPICS_CONCURRENCY", "5"))
+
+@app.post("/explainTopics")
+async def explain_topics(
+    topics: str = Form(...),
+    pdf_file: UploadFile = File(...),
+    streamFormat: str = Form("ndjson")
+):
+    """Explains many topics of one upload, streaming each result as soon as it is ready.
+
+    `topics` is a JSON array of {"title", "summary"} objects; any extra keys
+    (e.g. unitIndex/topicIndex) are echoed back on the matching result.
+    """
+    try:
+        topic_list = json.loads(topics)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="topics must be a JSON array")
+    if not isinstance(topic_list, list) or not topic_list:
+        raise HTTPException(status_code=400, detail="topics must be a non-empty JSON array")
+    topic_list = [t if isinstance(t, dict) else {"title": str(t)} for t in topic_list]
+    if streamFormat not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="streamFormat must be 'ndjson' or 'sse'")
+
+    from gemini_advanced import (
+        generate_topic_explanation,
+        get_tfidf_index,
+        is_image_path,
+        load_pdf_document,
+        extract_syllabus_from_image,
+    )
+
+    temp_pdf_path = await asyncio.to_thread(save_upload_to_temp, pdf_file)
+
+    # Extract and index the upload once for every topic
+    document = None
+    syllabus_text = None
+    try:
+        if is_image_path(temp_pdf_path):
+            syllabus_text = await extract_syllabus_from_image(temp_pdf_path)
+        else:
+            document = await asyncio.to_thread(load_pdf_document, temp_pdf_path)
+            await asyncio.to_thread(get_tfidf_index, document)
+    except asyncio.CancelledError:
+        remove_temp_files([temp_pdf_path])
+        raise
+    except Exception as e:
+        remove_temp_files([temp_pdf_path])
+        raise HTTPException(status_code=500, detail=str(e))
+
+    semaphore = asyncio.Semaphore(EXPLAIN_TOPICS_CONCURRENCY)
+
+    async def explain_one(index: int, topic: dict) -> dict:
+        title = topic.get("title", "")
+        summary = topic.get("summary")
+        result = {**topic, "index": index}
+        async with semaphore:
+            try:
+                explanation_task = generate_topic_explanation(
+                    temp_pdf_path, title, summary, document, syllabus_text
+                )
+                videos_task = asyncio.to_thread(search_youtube_videos, f"{title} tutorial explained")
+                explanation, videos = await asyncio.gather(explanation_task, videos_task)
+            except Exception as e:
+                logging.getLogger("main").error(f"Failed to explain topic '{title}': {e}")
+                result["error"] = str(e)
+                return result
+        if explanation is None:
+            result["error"] = "Failed to generate explanation after retries."
+        else:
+            result["explanation"] = explanation
+            result["youtubeVideos"] = videos
+        return result
+
+    def encode(payload: dict) -> str:
+        if streamFormat == "sse":
+            return f"data: {json.dumps(payload)}\n\n"
+        return json.dumps(payload) + "\n"
+
+    async def result_generator():
+        tasks = [asyncio.create_task(explain_one(i, t)) for i, t in enumerate(topic_list)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield encode(await next_done)
+            yield encode({"done": True, "count": len(tasks)})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if streamFormat == "sse" else "application/x-ndjson"
+    return TempFileStreamingResponse(
+        result_generator(),
+        temp_paths=[temp_pdf_path],
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # --- RAG Doubt Solver Endpoints ---
 
 class IngestRequest(BaseModel):
     pdfId: str
     extractedText: str
     roadmapTopics: list
+    # Pre-generate per-topic FAQs in the background; defaults to FAQ_ENABLED
+    generateFaq: Optional[bool] = None
 
 class DoubtRequest(BaseModel):
     pdfId: str
     question: str
     conversationHistory: list
+    # Optional current topic; retrieval searches its chunks first
+    unitIndex: Optional[int] = None
+    topicIndex: Optional[int] = None
 
 class DeleteVectorsRequest(BaseModel):
     pdfId: str
 
 @app.post("/ingest-document")
-def ingest_document(request: IngestRequest):
+async def ingest_document(request: IngestRequest):
     if not request.pdfId or not request.extractedText:
         raise HTTPException(status_code=400, detail="pdfId and extractedText are required")
         
     try:
         from rag.chunker import chunk_document
-        from rag.embedder import embed_batch
-        from rag.vector_store import upsert_chunks
+        from rag.ingest import ingest_chunks
+        from rag.answer_cache import answer_cache
+        from rag.faq import FAQ_ENABLED, schedule_faq_generation
+
+        # Answers cached against the previous version of the document are stale
+        answer_cache.invalidate(request.pdfId)
         
         # 1. Chunk document
-        chunks = chunk_document(request.extractedText, request.roadmapTopics, request.pdfId)
+        chunks = await asyncio.to_thread(
+            chunk_document, request.extractedText, request.roadmapTopics, request.pdfId
+        )
         if not chunks:
             return {"success": True, "chunksStored": 0, "message": "No chunks generated"}
             
-        # 2. Embed chunks
-        chunk_texts = [c.text for c in chunks]
-        embeddings = embed_batch(chunk_texts)
-        
-        # 3. Create Qdrant collection and upsert
-        upsert_chunks(request.pdfId, chunks, embeddings)
+        # 2. Embed new/changed chunks, upsert them and drop stale points
+        stats = await asyncio.to_thread(ingest_chunks, request.pdfId, chunks)
+
+        # 3. Generate FAQs in the background; kept as-is when the chunks did not change
+        generate_faq = FAQ_ENABLED if request.generateFaq is None else request.generateFaq
+        faq_status = schedule_faq_generation(request.pdfId, chunks, generate=generate_faq)
         
-        return {"success": True, "chunksStored": len(chunks)}
+        return {"success": True, "chunksStored": stats["chunks"], **stats, "faq": faq_status}
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi.responses import StreamingResponse
-import json
+doubt_stream_metrics = StreamMetrics()
+
+def retrieval_scope(request: DoubtRequest) -> Optional[dict]:
+    scope = {"unitIndex": request.unitIndex, "topicIndex": request.topicIndex}
+    scope = {field: value for field, value in scope.items() if value is not None}
+    return scope or None
 
 @app.post("/doubt-solver/stream")
 async def doubt_solver_stream(request: DoubtRequest, req: Request):
@@ -445,25 +617,20 @@ async def doubt_solver_stream(request: DoubtRequest, req: Request):
     if len(request.question) > 500:
         raise HTTPException(status_code=400, detail="Question cannot exceed 500 characters")
 
-    def event_generator():
-        try:
-            for token in solve_doubt_stream(
-                pdfId=request.pdfId,
-                question=request.question,
-                conversation_history=request.conversationHistory
-            ):
-                yield f"data: {json.dumps({'token': token})}\n\n"
-            yield f"data: {json.dumps({'done': True})}\n\n"
-        except Exception as e:
-            logger = logging.getLogger("main")
-            logger.error(f"Error in doubt stream: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    # Tokens are coalesced into small windows; a client disconnect cancels the upstream completion
+    tokens = solve_doubt_stream(
+        pdfId=request.pdfId,
+        question=request.question,
+        conversation_history=request.conversationHistory,
+        scope=retrieval_scope(request)
+    )
+    event_generator = stream_tokens_as_sse(req, tokens, doubt_stream_metrics, max_tokens=DOUBT_MAX_TOKENS)
 
     origin = req.headers.get("origin")
     allowed_origin = origin if origin in origins else (origins[0] if origins else "*")
 
     return StreamingResponse(
-        event_generator(),
+        event_generator,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -477,12 +644,18 @@ async def doubt_solver_stream(request: DoubtRequest, req: Request):
     )
 
 @app.delete("/delete-document-vectors")
-def delete_document_vectors(request: DeleteVectorsRequest):
+async def delete_document_vectors(request: DeleteVectorsRequest):
     if not request.pdfId:
         raise HTTPException(status_code=400, detail="pdfId is required")
     try:
         from rag.vector_store import delete_collection
-        delete_collection(request.pdfId)
+        from rag.answer_cache import answer_cache
+        from rag.bm25_index import delete_lexical_index
+        from rag.faq import delete_faq
+        await asyncio.to_thread(delete_collection, request.pdfId)
+        await asyncio.to_thread(delete_lexical_index, request.pdfId)
+        delete_faq(request.pdfId)
+        answer_cache.invalidate(request.pdfId)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
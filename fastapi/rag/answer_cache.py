@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("answer_cache")
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_PER_DOC = int(os.environ.get("ANSWER_CACHE_MAX_PER_DOC", "256"))
+ANSWER_CACHE_MAX_DOCS = int(os.environ.get("ANSWER_CACHE_MAX_DOCS", "1000"))
+
+
+def normalize_vector(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _scope_key(scope: Optional[dict]) -> tuple:
+    return tuple(sorted(scope.items())) if scope else ()
+
+
+class SemanticAnswerCache:
+    """Per-document cache of answers keyed by question embedding.
+
+    A lookup hits when a stored question asked in the same retrieval scope
+    has cosine similarity >= threshold with the new one. Entries expire after
+    ttl_seconds; both the entries of a document and the set of documents are
+    LRU-bounded.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_per_doc: int, max_docs: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_doc = max_per_doc
+        self.max_docs = max_docs
+        self.hits = 0
+        self.misses = 0
+        self._docs = OrderedDict()  # pdfId -> OrderedDict[entry_id, (vector, answer, stored_at, scope)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, pdfId: str, embedding, scope: Optional[dict] = None) -> Optional[str]:
+        query = normalize_vector(embedding)
+        scope_key = _scope_key(scope)
+        now = time.time()
+        with self._lock:
+            entries = self._docs.get(pdfId)
+            if entries:
+                for entry_id in [k for k, (_, _, t, _) in entries.items() if now - t > self.ttl_seconds]:
+                    del entries[entry_id]
+            entry_ids = [k for k, e in entries.items() if e[3] == scope_key] if entries else []
+            if not entry_ids:
+                self.misses += 1
+                return None
+            scores = np.stack([entries[k][0] for k in entry_ids]).dot(query)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = entry_ids[best]
+            entries.move_to_end(entry_id)
+            self._docs.move_to_end(pdfId)
+            self.hits += 1
+            logger.info(f"Answer cache hit for '{pdfId}' (similarity {scores[best]:.3f}).")
+            return entries[entry_id][1]
+
+    def store(self, pdfId: str, embedding, answer: str, scope: Optional[dict] = None) -> None:
+        if not answer:
+            return
+        with self._lock:
+            entries = self._docs.setdefault(pdfId, OrderedDict())
+            self._docs.move_to_end(pdfId)
+            entries[self._next_id] = (normalize_vector(embedding), answer, time.time(), _scope_key(scope))
+            self._next_id += 1
+            while len(entries) > self.max_per_doc:
+                entries.popitem(last=False)
+            while len(self._docs) > self.max_docs:
+                self._docs.popitem(last=False)
+
+    def invalidate(self, pdfId: str) -> None:
+        with self._lock:
+            if self._docs.pop(pdfId, None) is not None:
+                logger.info(f"Invalidated answer cache for '{pdfId}'.")
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._docs),
+            "entries": sum(len(e) for e in self._docs.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_PER_DOC, ANSWER_CACHE_MAX_DOCS
+)
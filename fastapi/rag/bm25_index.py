@@ -0,0 +1,157 @@
+import os
+import pickle
+import logging
+import tempfile
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from services.cache import LRUCache
+from services.tfidf_index import tokenize
+from rag.vector_store_base import document_slug, matches_scope
+
+logger = logging.getLogger("bm25_index")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEXICAL_INDEX_DIR = os.environ.get("LEXICAL_INDEX_DIR", os.path.join(BASE_DIR, ".lexical"))
+LEXICAL_INDEX_CACHE_DOCS = int(os.environ.get("LEXICAL_INDEX_CACHE_DOCS", "64"))
+BM25_K1 = float(os.environ.get("BM25_K1", "1.5"))
+BM25_B = float(os.environ.get("BM25_B", "0.75"))
+
+# Question words and fillers dropped from queries; they carry no evidence of a match
+QUERY_STOPWORDS = frozenset("""
+a an and are as at be by can could do does explain for from give how i in is it me of on or please
+tell the this that to was what when where which who why with would you your
+""".split())
+
+
+class BM25Index:
+    """Okapi BM25 index over one document's chunks.
+
+    Holds the point id, text and metadata of every chunk so lexical hits can
+    be returned in the same shape as vector-store results. Per-term BM25
+    weights are precomputed into a CSC matrix (chunks x terms), so a query is
+    a column slice and a row sum.
+    """
+
+    def __init__(self, ids: list, texts: list, metadata: list, vocabulary: dict,
+                 idf: np.ndarray, weights: sp.csc_matrix):
+        self.ids = ids
+        self.texts = texts
+        self.metadata = metadata
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights
+        self.rows = {point_id: i for i, point_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, ids: list, texts: list, metadata: list, k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        vocabulary = {}
+        indptr, indices, data = [0], [], []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            counts = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        tf = sp.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), len(vocabulary)),
+        )
+        n_docs = len(texts)
+        df = np.bincount(tf.indices, minlength=len(vocabulary))
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avg_length = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        norm = k1 * (1 - b + b * lengths / avg_length)
+        # Expand the per-row normaliser to the stored entries of each row
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + row_norm)
+        return cls(list(ids), list(texts), list(metadata), vocabulary, idf, tf.tocsc())
+
+    def _query_terms(self, query: str) -> list:
+        return list(dict.fromkeys(t for t in tokenize(query) if t not in QUERY_STOPWORDS))
+
+    def query(self, query: str, top_k: int, scope: dict = None) -> list:
+        """Returns [(row, bm25 score)] of the best-scoring chunks with a non-zero score, best first.
+
+        scope restricts the candidates to chunks whose metadata matches it.
+        """
+        term_ids = [self.vocabulary[t] for t in self._query_terms(query) if t in self.vocabulary]
+        if not term_ids or not self.ids or top_k <= 0:
+            return []
+        scores = np.asarray(self.weights[:, term_ids].sum(axis=1)).ravel()
+        if scope:
+            scores[[i for i, m in enumerate(self.metadata) if not matches_scope(m, scope)]] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def coverage(self, query: str, rows: list) -> np.ndarray:
+        """IDF-weighted share of the query's terms that occur in each given chunk, in [0, 1].
+
+        Terms absent from the document count with the maximum IDF, so a
+        question about something the notes never mention scores low.
+        """
+        terms = self._query_terms(query)
+        if not terms or not rows:
+            return np.zeros(len(rows), dtype=np.float32)
+        max_idf = float(np.log1p((len(self.ids) + 0.5) / 0.5))
+        known = [self.vocabulary[t] for t in terms if t in self.vocabulary]
+        total = float(self.idf[known].sum()) + max_idf * (len(terms) - len(known))
+        if not known or total <= 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        present = (self.weights[rows][:, known] > 0).toarray()
+        return present.dot(self.idf[known]) / total
+
+
+# --- Persistence: one pickle per document, with an LRU of loaded indexes ---
+_loaded = LRUCache(max_items=LEXICAL_INDEX_CACHE_DOCS)
+
+
+def _index_path(pdfId: str) -> str:
+    return os.path.join(LEXICAL_INDEX_DIR, f"{document_slug(pdfId)}.pkl")
+
+
+def save_lexical_index(pdfId: str, index: BM25Index) -> None:
+    os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=LEXICAL_INDEX_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _index_path(pdfId))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _loaded.set(pdfId, index)
+
+
+def load_lexical_index(pdfId: str):
+    """Returns the document's BM25 index, or None if it was ingested before hybrid retrieval existed."""
+    index = _loaded.get(pdfId)
+    if index is not None:
+        return index
+    try:
+        with open(_index_path(pdfId), "rb") as f:
+            index = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable lexical index for '{pdfId}': {e}")
+        return None
+    _loaded.set(pdfId, index)
+    return index
+
+
+def delete_lexical_index(pdfId: str) -> None:
+    _loaded.pop(pdfId)
+    try:
+        os.remove(_index_path(pdfId))
+    except FileNotFoundError:
+        pass
@@ -2,6 +2,9 @@ import re
 from dataclasses import dataclass
 from typing import List, Dict, Any
 
+import numpy as np
+import scipy.sparse as sp
+
 @dataclass
 class Chunk:
     text: str
@@ -16,8 +19,70 @@ def clean_text_for_keywords(text: str) -> set:
     stop_words = {'the', 'and', 'for', 'with', 'you', 'that', 'this', 'from', 'are', 'was', 'were', 'have', 'has', 'not', 'but', 'can'}
     return set(w for w in words if w not in stop_words)
 
+KEYWORD_PATTERN = re.compile(r'[a-zA-Z]{3,}')
+
+# Rows of the paragraph x topic overlap matrix densified at a time
+ASSIGNMENT_BLOCK_ROWS = 4096
+
+def _keyword_matrix(keyword_sets: List[set], vocabulary: Dict[str, int]) -> sp.csr_matrix:
+    """Binary row-per-set matrix over the vocabulary; words outside it are dropped."""
+    indptr = [0]
+    indices = []
+    for keywords in keyword_sets:
+        indices.extend(vocabulary[w] for w in keywords)
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.int32)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(keyword_sets), len(vocabulary)))
+
+def assign_passages_to_topics(paragraphs: List[str], topic_keywords: List[set]):
+    """Returns the topic index for each paragraph, plus whether it matched by keyword.
+
+    A paragraph goes to the topic sharing the most keywords with it (first
+    topic on ties). Paragraphs sharing none go to the topic whose evenly spaced
+    position (t / n_topics * n_paragraphs) is nearest to their own index.
+    """
+    n_paragraphs = len(paragraphs)
+    n_topics = len(topic_keywords)
+
+    vocabulary: Dict[str, int] = {}
+    for keywords in topic_keywords:
+        for word in keywords:
+            vocabulary.setdefault(word, len(vocabulary))
+
+    # Keyword overlap counts for every (paragraph, topic) pair in one sparse product.
+    # Only topic words matter, and stop words never are one, so paragraph keywords
+    # are just the distinct tokens intersected with the vocabulary (done in C).
+    vocabulary_words = vocabulary.keys()
+    topic_terms = _keyword_matrix(topic_keywords, vocabulary)
+    paragraph_terms = _keyword_matrix(
+        [vocabulary_words & set(KEYWORD_PATTERN.findall(p.lower())) for p in paragraphs], vocabulary
+    )
+    overlap = paragraph_terms.dot(topic_terms.T).tocsr()
+
+    assignment = np.zeros(n_paragraphs, dtype=np.int64)
+    matched = np.zeros(n_paragraphs, dtype=bool)
+    for start in range(0, n_paragraphs, ASSIGNMENT_BLOCK_ROWS):
+        block = overlap[start:start + ASSIGNMENT_BLOCK_ROWS].toarray()
+        # argmax returns the first maximum, i.e. the lowest topic index on ties
+        best = block.argmax(axis=1)
+        assignment[start:start + len(block)] = best
+        matched[start:start + len(block)] = block[np.arange(len(block)), best] > 0
+
+    # Nearest evenly spaced topic position. |idx - t*P/T| is convex in t, so the
+    # minimiser is next to idx*T/P; neighbouring candidates absorb float rounding
+    # and distances use the same expression as the reference loop.
+    unassigned = np.flatnonzero(~matched)
+    if unassigned.size:
+        centre = np.floor(unassigned * n_topics / n_paragraphs).astype(np.int64)
+        candidates = np.clip(centre[:, None] + np.array([-1, 0, 1, 2]), 0, n_topics - 1)
+        distances = np.abs(unassigned[:, None] - (candidates / n_topics) * n_paragraphs)
+        # Candidates are ascending, so argmin's first-minimum rule keeps the lowest topic on ties
+        assignment[unassigned] = candidates[np.arange(unassigned.size), np.argmin(distances, axis=1)]
+
+    return assignment, matched
+
 def chunk_document(extracted_text: str, roadmap_topics: List[Dict[str, Any]], pdf_id: str) -> List[Chunk]:
-    if not extracted_text:
+    if not extracted_text or not roadmap_topics:
         return []
     
     # 1. Split text into passages (paragraphs)
@@ -33,39 +98,14 @@ def chunk_document(extracted_text: str, roadmap_topics: List[Dict[str, Any]], pd
         keywords = clean_text_for_keywords(title + " " + summary)
         topic_keywords.append(keywords)
         
-    # 2. Assign passages to topics based on keyword matching
+    # 2-3. Assign passages to topics by keyword overlap, falling back to the
+    # nearest topic by position. Keyword matches come first within a topic.
+    assignment, matched = assign_passages_to_topics(paragraphs, topic_keywords)
     topic_passages: Dict[int, List[str]] = {i: [] for i in range(len(roadmap_topics))}
-    unassigned: List[tuple] = [] # List of (passage_index, passage_text)
-    
-    for idx, passage in enumerate(paragraphs):
-        passage_words = clean_text_for_keywords(passage)
-        best_topic_idx = -1
-        max_matches = 0
-        
-        for t_idx, keywords in enumerate(topic_keywords):
-            matches = len(passage_words.intersection(keywords))
-            if matches > max_matches:
-                max_matches = matches
-                best_topic_idx = t_idx
-                
-        if best_topic_idx != -1:
-            topic_passages[best_topic_idx].append(passage)
-        else:
-            unassigned.append((idx, passage))
-            
-    # 3. Assign unassigned passages to the nearest topic by index
-    for idx, passage in unassigned:
-        closest_topic_idx = 0
-        min_distance = float('inf')
-        
-        for t_idx in range(len(roadmap_topics)):
-            target_pos = (t_idx / len(roadmap_topics)) * len(paragraphs)
-            dist = abs(idx - target_pos)
-            if dist < min_distance:
-                min_distance = dist
-                closest_topic_idx = t_idx
-                
-        topic_passages[closest_topic_idx].append(passage)
+    for idx in np.flatnonzero(matched):
+        topic_passages[int(assignment[idx])].append(paragraphs[idx])
+    for idx in np.flatnonzero(~matched):
+        topic_passages[int(assignment[idx])].append(paragraphs[idx])
         
     # 4. Formulate chunks with max size 1000 characters and 100 overlap
     chunks: List[Chunk] = []
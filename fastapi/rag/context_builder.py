@@ -0,0 +1,225 @@
+import os
+import re
+import math
+import hashlib
+import logging
+
+from services.cache import LRUCache
+
+logger = logging.getLogger("context_builder")
+
+# Llama-family tokenizers average roughly four characters of English per token
+CHARS_PER_TOKEN = 4.0
+
+# Prompt budgets per model, kept well under the context window to bound time-to-first-token
+MODEL_PROMPT_BUDGETS = {
+    "llama-3.3-70b-versatile": 8000,
+    "llama-3.1-8b-instant": 6000,
+}
+DEFAULT_PROMPT_BUDGET = 6000
+DOUBT_PROMPT_TOKEN_BUDGET = int(os.environ.get("DOUBT_PROMPT_TOKEN_BUDGET", "0"))  # 0: per-model budgets
+
+# Share of the non-fixed budget conversation history may use; the rest goes to context
+HISTORY_BUDGET_SHARE = float(os.environ.get("HISTORY_BUDGET_SHARE", "0.3"))
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", "6"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.environ.get("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_SUMMARY_LINE_CHARS = 160
+HISTORY_SUMMARY_CACHE_SIZE = int(os.environ.get("HISTORY_SUMMARY_CACHE_SIZE", "2048"))
+# Blocks are cut rather than dropped only when at least this many tokens remain
+MIN_PARTIAL_TOKENS = 64
+
+# Overlap lengths checked between neighbouring chunks (the chunker overlaps by 100 chars);
+# shorter matches are coincidences, e.g. a chunk ending in the letter the next one starts with
+MIN_CHUNK_OVERLAP_CHARS = 50
+MAX_CHUNK_OVERLAP_CHARS = 200
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Rolling summaries keyed by a hash chain over the summarized turns, so a
+# conversation reuses the summary of its previous prefix as it grows
+_summary_cache = LRUCache(max_items=HISTORY_SUMMARY_CACHE_SIZE)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = int(tokens * CHARS_PER_TOKEN)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " ..."
+
+
+def prompt_budget(models: list) -> int:
+    """Prompt token budget that fits every model the request may fall back to."""
+    if DOUBT_PROMPT_TOKEN_BUDGET > 0:
+        return DOUBT_PROMPT_TOKEN_BUDGET
+    return min((MODEL_PROMPT_BUDGETS.get(m, DEFAULT_PROMPT_BUDGET) for m in models), default=DEFAULT_PROMPT_BUDGET)
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right, or 0 if shorter than MIN_CHUNK_OVERLAP_CHARS."""
+    for size in range(min(len(left), len(right), MAX_CHUNK_OVERLAP_CHARS), MIN_CHUNK_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def dedupe_chunks(chunks: list) -> list:
+    """Drops repeated chunks and trims text a chunk shares with a neighbour already kept.
+
+    Chunks stay in relevance order; trimmed copies are returned, inputs are untouched.
+    """
+    kept = []
+    seen = set()
+    for chunk in chunks:
+        text = chunk["text"]
+        if text in seen or any(text in k["text"] for k in kept):
+            continue
+        seen.add(text)
+        for other in kept:
+            head = _overlap(other["text"], text)
+            if head:
+                text = text[head:]
+            tail = _overlap(text, other["text"])
+            if tail:
+                text = text[:-tail]
+        if text.strip():
+            kept.append({**chunk, "text": text})
+    return kept
+
+
+def fit_blocks(blocks: list, budget: int) -> list:
+    """Keeps blocks in order until the budget is spent, cutting the last one if worthwhile."""
+    fitted = []
+    used = 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if used + tokens <= budget:
+            fitted.append(block)
+            used += tokens
+            continue
+        if budget - used >= MIN_PARTIAL_TOKENS:
+            fitted.append(truncate_to_tokens(block, budget - used))
+        break
+    return fitted
+
+
+def _summary_line(turn: dict) -> str:
+    label = "Student" if turn["role"] == "user" else "Assistant"
+    first = _SENTENCE_END.split(turn["content"].strip(), 1)[0]
+    if len(first) > HISTORY_SUMMARY_LINE_CHARS:
+        first = first[:HISTORY_SUMMARY_LINE_CHARS].rstrip() + "..."
+    return f"- {label}: {first}"
+
+
+def _trim_summary(lines: list, max_tokens: int) -> list:
+    # Oldest lines go first
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines = lines[1:]
+    return lines
+
+
+def rolling_summary(turns: list) -> str:
+    """Extractive summary of older turns: the first sentence of each, newest kept when over budget.
+
+    Summaries are cached per prefix of the conversation, so each new request
+    only summarizes the turns that fell out of the verbatim window since the
+    last one. Done locally: an LLM summary would add a round-trip before the
+    answer starts streaming.
+    """
+    digests = []
+    digest = ""
+    for turn in turns:
+        digest = hashlib.sha256(f"{digest}|{turn['role']}|{turn['content']}".encode("utf-8")).hexdigest()
+        digests.append(digest)
+
+    start, lines = 0, []
+    for i in range(len(turns), 0, -1):
+        cached = _summary_cache.get(digests[i - 1])
+        if cached is not None:
+            start, lines = i, cached
+            break
+    if start == len(turns):
+        return "\n".join(lines)
+
+    lines = _trim_summary(lines + [_summary_line(t) for t in turns[start:]], HISTORY_SUMMARY_MAX_TOKENS)
+    _summary_cache.set(digests[-1], lines)
+    return "\n".join(lines)
+
+
+def compress_history(history: list, budget: int) -> tuple:
+    """Splits history into (summary of older turns, recent turns kept verbatim) within budget tokens."""
+    turns = [
+        {"role": t.get("role", "user"), "content": t.get("content", "")}
+        for t in (history or [])
+        if t.get("role", "user") in ("user", "assistant") and t.get("content")
+    ]
+    if not turns or budget <= 0:
+        return "", []
+
+    reserve = min(HISTORY_SUMMARY_MAX_TOKENS, budget // 3) if len(turns) > 1 else 0
+    recent = []
+    used = 0
+    for turn in reversed(turns):
+        if len(recent) >= HISTORY_MAX_TURNS:
+            break
+        tokens = estimate_tokens(turn["content"])
+        if used + tokens > budget - reserve:
+            left = budget - reserve - used
+            # Only the newest turn is cut; older ones move into the summary
+            if not recent and left >= MIN_PARTIAL_TOKENS:
+                recent.append({**turn, "content": truncate_to_tokens(turn["content"], left)})
+                used += left
+            break
+        recent.append(turn)
+        used += tokens
+    recent.reverse()
+
+    older = turns[:len(turns) - len(recent)]
+    summary = ""
+    if older:
+        lines = _trim_summary(rolling_summary(older).split("\n"), budget - used)
+        summary = "\n".join(lines)
+    return summary, recent
+
+
+def build_doubt_messages(instructions: str, context_blocks: list, source_info: str,
+                         history: list, question: str, models: list) -> list:
+    """Assembles the doubt-solver chat messages within the prompt token budget of the models.
+
+    Fixed parts (instructions, source note, question) are always sent. The
+    rest of the budget is split between conversation history (up to
+    HISTORY_BUDGET_SHARE, older turns summarized) and context blocks, which
+    are kept in relevance order and truncated once the budget runs out.
+    """
+    budget = prompt_budget(models)
+    fixed = estimate_tokens(instructions) + estimate_tokens(source_info) + estimate_tokens(question) + 16
+    available = max(budget - fixed, 0)
+
+    summary, recent = compress_history(history, int(available * HISTORY_BUDGET_SHARE))
+    history_tokens = estimate_tokens(summary) + sum(estimate_tokens(t["content"]) for t in recent)
+    fitted = fit_blocks(context_blocks, available - history_tokens)
+    context_tokens = sum(estimate_tokens(b) for b in fitted)
+
+    context_text = "\n\n".join(fitted) if fitted else "None."
+    system_prompt = (
+        f"{instructions}\n\n"
+        f"Context details:\n{context_text}\n\n"
+        f"Note on sources: {source_info}"
+    )
+    if summary:
+        system_prompt += f"\n\nEarlier in this conversation (summary):\n{summary}"
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(recent)
+    messages.append({"role": "user", "content": question})
+
+    logger.info(
+        f"Prompt budget {budget} tokens: fixed {fixed}, history {history_tokens} "
+        f"({len(recent)} turns verbatim, summary {estimate_tokens(summary)}), "
+        f"context {context_tokens} ({len(fitted)}/{len(context_blocks)} blocks), "
+        f"unused {budget - fixed - history_tokens - context_tokens}."
+    )
+    return messages
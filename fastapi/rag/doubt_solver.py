@@ -1,118 +1,138 @@
 import os
+import re
+import asyncio
 import logging
-from typing import Generator
+from typing import AsyncGenerator, Optional
 from dotenv import load_dotenv
-from groq import Groq
 
 # Load environment variables
 load_dotenv()
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
 
 from rag.retriever import retrieve
+from rag.embedder import embed_text
+from rag.answer_cache import ANSWER_CACHE_ENABLED, answer_cache
+from rag.faq import match_faq
 from services.tavily_service import search_web
+from rag.context_builder import build_doubt_messages, dedupe_chunks
+from services.llm_client import get_llm_client
 
 logger = logging.getLogger("doubt_solver")
 
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 RAG_SIMILARITY_THRESHOLD = float(os.environ.get("RAG_SIMILARITY_THRESHOLD", "0.65"))
 RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "4"))
+# Start the web search alongside embedding/retrieval so low-confidence doubts wait
+# for max(rag, web) rather than the sum; the search is abandoned when RAG is confident
+WEB_SEARCH_SPECULATIVE = os.environ.get("WEB_SEARCH_SPECULATIVE", "false").lower() == "true"
+# Cap on answer length; also bounds the cost of a stream the client abandons
+DOUBT_MAX_TOKENS = int(os.environ.get("DOUBT_MAX_TOKENS", "1024"))
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+def replay_answer(answer: str):
+    """Splits a cached answer into word-sized tokens for the SSE stream."""
+    return re.findall(r"\s*\S+\s*", answer) or [answer]
 
-def solve_doubt_stream(
+async def solve_doubt_stream(
     pdfId: str,
     question: str,
     conversation_history: list,
-    use_web_fallback: bool = True
-) -> Generator[str, None, None]:
-    
+    use_web_fallback: bool = True,
+    scope: Optional[dict] = None
+) -> AsyncGenerator[str, None]:
+    """Streams an answer to a doubt; scope optionally focuses retrieval on the current unit/topic."""
+    web_task = None
+    if use_web_fallback and WEB_SEARCH_SPECULATIVE:
+        web_task = asyncio.create_task(asyncio.to_thread(search_web, question))
+    try:
+        async for token in _solve_doubt(pdfId, question, conversation_history, use_web_fallback, web_task, scope):
+            yield token
+    finally:
+        if web_task is not None and not web_task.done():
+            # The worker thread finishes on its own (and fills the web cache); we just stop waiting
+            web_task.cancel()
+
+async def _solve_doubt(pdfId, question, conversation_history, use_web_fallback, web_task, scope):
+    # 0. Embed the question once and check the answer cache. Follow-ups depend on
+    # the conversation so only standalone questions are cached.
+    query_embedding = None
+    cacheable = ANSWER_CACHE_ENABLED and not conversation_history
+    try:
+        query_embedding = await asyncio.to_thread(embed_text, question)
+    except Exception as e:
+        logger.error(f"Failed to embed question: {e}")
+
+    if cacheable and query_embedding is not None:
+        cached_answer = answer_cache.lookup(pdfId, query_embedding, scope)
+        if cached_answer is not None:
+            for token in replay_answer(cached_answer):
+                yield token
+            return
+
+    # Standalone questions close to a pre-generated FAQ question of the same unit/topic are answered from it
+    if not conversation_history and query_embedding is not None:
+        faq_entry = match_faq(pdfId, query_embedding, scope)
+        if faq_entry is not None:
+            for token in replay_answer(faq_entry["answer"]):
+                yield token
+            return
+
     # 1. Retrieve RAG chunks
     rag_chunks = []
     max_score = 0.0
     
     try:
-        rag_chunks = retrieve(pdfId, question, top_k=RAG_TOP_K)
+        rag_chunks = await asyncio.to_thread(retrieve, pdfId, question, RAG_TOP_K, query_embedding, scope)
         if rag_chunks:
-            max_score = max(r["score"] for r in rag_chunks)
+            max_score = max(r["confidence"] for r in rag_chunks)
     except Exception as e:
         logger.error(f"Failed to retrieve chunks: {e}")
         # If retriever fails (e.g. collection missing), max_score stays 0.0
     
-    logger.info(f"RAG search max similarity score: {max_score}")
+    logger.info(f"RAG search max confidence: {max_score}")
     
     # 2. Determine context strategy
-    context_text = ""
-    source_info = ""
-    
     if max_score >= RAG_SIMILARITY_THRESHOLD:
         # Use RAG context only
-        context_parts = []
-        for c in rag_chunks:
-            title = c["metadata"].get("topicTitle", "Section")
-            context_parts.append(f"[{title}]: {c['text']}")
-        context_text = "\n\n".join(context_parts)
+        if web_task is not None:
+            web_task.cancel()
+        context_blocks = [
+            f"[{c['metadata'].get('topicTitle', 'Section')}]: {c['text']}"
+            for c in dedupe_chunks(rag_chunks)
+        ]
         source_info = "Answered from study material context."
     elif use_web_fallback:
-        # Call Tavily web search
-        web_results = search_web(question)
-        web_parts = []
-        for w in web_results:
-            web_parts.append(f"Source: {w['url']}\nTitle: {w['title']}\nContent: {w['content']}")
-            
-        best_rag = ""
+        # Call Tavily web search (or collect the speculative one)
+        if web_task is not None:
+            web_results = await web_task
+        else:
+            web_results = await asyncio.to_thread(search_web, question)
+        context_blocks = [
+            f"Source: {w['url']}\nTitle: {w['title']}\nContent: {w['content']}" for w in web_results
+        ]
         if rag_chunks:
-            best_rag = f"\n\nBest matching study material chunk:\n{rag_chunks[0]['text']}"
-            
-        context_text = "\n\n".join(web_parts) + best_rag
+            context_blocks.append(f"Best matching study material chunk:\n{rag_chunks[0]['text']}")
         source_info = "Answered using web search results combined with study material."
     else:
         # General knowledge only
-        context_text = "None. Answer from general knowledge."
+        context_blocks = ["None. Answer from general knowledge."]
         source_info = "Answered from general knowledge. (Study material did not contain high-confidence matches)"
         
-    # 3. Build Groq messages
+    # 3. Build Groq messages within the prompt token budget; older history turns are summarized
+    llm_client = get_llm_client()
     system_prompt = (
         "You are a helpful study assistant for students. You answer doubts "
         "based on the provided study material context. Be clear, accurate, "
         "and use simple language appropriate for students. If the answer "
-        "comes from web search, mention it briefly. Never make up facts.\n\n"
-        f"Context details:\n{context_text}\n\n"
-        f"Note on sources: {source_info}"
+        "comes from web search, mention it briefly. Never make up facts."
+    )
+    messages = build_doubt_messages(
+        system_prompt, context_blocks, source_info, conversation_history, question, llm_client.models
     )
     
-    # Build messages: system prompt, last 5 turns of conversation_history, current question
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add last 5 turns of history (10 elements if role/content keys are matching)
-    history_slice = conversation_history[-5:] if conversation_history else []
-    for turn in history_slice:
-        role = turn.get("role", "user")
-        content = turn.get("content", "")
-        if role in ("user", "assistant") and content:
-            messages.append({"role": role, "content": content})
-            
-    # Add current question
-    messages.append({"role": "user", "content": question})
-    
-    # 4. Stream tokens from Groq
-    def stream_model(model_name: str) -> Generator[str, None, None]:
-        completion = groq_client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.3,
-            stream=True
-        )
-        for chunk in completion:
-            token = chunk.choices[0].delta.content or ""
-            yield token
+    # 4. Stream tokens from Groq (primary model with fallback)
+    answer_parts = []
+    async for token in llm_client.stream(messages, temperature=0.3, max_tokens=DOUBT_MAX_TOKENS):
+        answer_parts.append(token)
+        yield token
 
-    try:
-        logger.info("Calling Groq llama-3.3-70b-versatile stream...")
-        yield from stream_model("llama-3.3-70b-versatile")
-    except Exception as e:
-        logger.warn(f"Groq primary model failed: {e}. Trying fallback model llama-3.1-8b-instant stream...")
-        try:
-            yield from stream_model("llama-3.1-8b-instant")
-        except Exception as e_fallback:
-            logger.error(f"Both Groq models failed: {e_fallback}")
-            raise e_fallback
+    if cacheable and query_embedding is not None:
+        answer_cache.store(pdfId, query_embedding, "".join(answer_parts), scope)
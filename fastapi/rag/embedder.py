@@ -1,9 +1,56 @@
 import os
+import re
+import queue
+import hashlib
 import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import google.generativeai as genai
 
+from services.cache import CACHE_ROOT, DiskCache, LRUCache
+
 logger = logging.getLogger("rag_embedder")
 
+EMBEDDING_MODEL = "models/gemini-embedding-2"
+EMBEDDING_DIMENSIONS = 768
+
+# Query embedding cache (memory LRU, optionally backed by disk)
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_DISK = os.environ.get("EMBED_CACHE_DISK", "false").lower() == "true"
+EMBED_CACHE_DISK_MB = int(os.environ.get("EMBED_CACHE_DISK_MB", "256"))
+
+# Concurrent embed_text calls arriving within this window share one request
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX_SIZE = int(os.environ.get("EMBED_BATCH_MAX_SIZE", "100"))
+# Batches are sent from a small pool so one batch backing off does not hold up the next
+EMBED_BATCH_WORKERS = int(os.environ.get("EMBED_BATCH_WORKERS", "4"))
+# Interactive queries get their own rate limit and a short retry budget: a doubt
+# should fail fast rather than wait out ingestion-sized backoffs
+EMBED_QUERY_RATE_LIMIT_RPS = float(os.environ.get("EMBED_QUERY_RATE_LIMIT_RPS", "2"))
+EMBED_QUERY_RATE_LIMIT_BURST = int(os.environ.get("EMBED_QUERY_RATE_LIMIT_BURST", "5"))
+EMBED_QUERY_MAX_RETRIES = int(os.environ.get("EMBED_QUERY_MAX_RETRIES", "2"))
+EMBED_QUERY_BACKOFF_MAX_SECONDS = float(os.environ.get("EMBED_QUERY_BACKOFF_MAX_SECONDS", "2"))
+# Upper bound on an embed_text wait, covering the rate-limit wait and the retries above
+EMBED_QUERY_TIMEOUT_SECONDS = float(os.environ.get("EMBED_QUERY_TIMEOUT_SECONDS", "30"))
+
+# Ingestion: provider-sized sub-batches sent concurrently under a shared rate limit.
+# Together with the query limit this stays within the provider's quota.
+EMBED_SUB_BATCH_SIZE = int(os.environ.get("EMBED_SUB_BATCH_SIZE", "100"))
+EMBED_MAX_WORKERS = int(os.environ.get("EMBED_MAX_WORKERS", "4"))
+EMBED_RATE_LIMIT_RPS = float(os.environ.get("EMBED_RATE_LIMIT_RPS", "3"))
+EMBED_RATE_LIMIT_BURST = int(os.environ.get("EMBED_RATE_LIMIT_BURST", "10"))
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE_SECONDS = float(os.environ.get("EMBED_BACKOFF_BASE_SECONDS", "1"))
+EMBED_BACKOFF_MAX_SECONDS = float(os.environ.get("EMBED_BACKOFF_MAX_SECONDS", "30"))
+
+_embedding_cache = LRUCache(max_items=EMBED_CACHE_SIZE)
+_embedding_disk_cache = (
+    DiskCache(os.path.join(CACHE_ROOT, "embeddings"), EMBED_CACHE_DISK_MB * 1024 * 1024)
+    if EMBED_CACHE_DISK else None
+)
+
 # Global reference to keep configure state
 _configured = False
 
@@ -31,33 +78,218 @@ def load_embedding_model():
         logger.error(f"Failed to configure Generative AI: {e}")
     return None
 
-def embed_text(text: str) -> list[float]:
+class TokenBucket:
+    """Blocking token-bucket rate limiter shared by the embedding requests of one traffic class."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+_rate_limiter = TokenBucket(EMBED_RATE_LIMIT_RPS, EMBED_RATE_LIMIT_BURST)
+_query_rate_limiter = TokenBucket(EMBED_QUERY_RATE_LIMIT_RPS, EMBED_QUERY_RATE_LIMIT_BURST)
+
+def _is_retryable(error: Exception) -> bool:
+    try:
+        from google.api_core import exceptions as google_exceptions
+        if isinstance(error, (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )):
+            return True
+    except ImportError:
+        pass
+    message = str(error)
+    return any(code in message for code in ("429", "500", "503", "504", "quota", "timed out"))
+
+def _embed_request(texts: list, task_type: str, limiter: TokenBucket = _rate_limiter,
+                   max_retries: int = EMBED_MAX_RETRIES, max_backoff: float = EMBED_BACKOFF_MAX_SECONDS) -> list:
+    """Sends one rate-limited embedding request, retrying transient failures with exponential backoff.
+
+    Defaults are the ingestion limits; the query batcher passes its own.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            response = genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=texts,
+                task_type=task_type,
+                output_dimensionality=EMBEDDING_DIMENSIONS
+            )
+            return response["embedding"]
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries or not _is_retryable(e):
+                raise
+            delay = min(max_backoff, EMBED_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"Embedding request failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _cache_key(text: str, task_type: str) -> str:
+    normalized = re.sub(r"\s+", " ", text).strip().casefold()
+    return hashlib.sha256(f"{task_type}\x00{normalized}".encode("utf-8")).hexdigest()
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched API calls.
+
+    One thread collects requests into batches; the batches are sent from a
+    small pool, so a batch retrying after a 429 does not delay later ones.
+    """
+
+    def __init__(self, window_ms: float, max_batch_size: int, workers: int):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding-flush")
+
+    def submit(self, text: str, task_type: str) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, task_type, future))
+        return future
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            by_task = {}
+            for item in pending:
+                by_task.setdefault(item[1], []).append(item)
+            for task_type, items in by_task.items():
+                try:
+                    self._executor.submit(self._flush, task_type, items)
+                except BaseException as e:
+                    self._fail(items, e)
+
+    @staticmethod
+    def _fail(items: list, error: BaseException) -> None:
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(error)
+
+    def _flush(self, task_type: str, items: list) -> None:
+        """Sends one batch; every waiting future is resolved, whatever goes wrong."""
+        try:
+            texts = list(dict.fromkeys(text for text, _, _ in items))
+            embeddings = _embed_request(
+                texts, task_type, _query_rate_limiter, EMBED_QUERY_MAX_RETRIES, EMBED_QUERY_BACKOFF_MAX_SECONDS
+            )
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Embedding response has {len(embeddings)} vectors for {len(texts)} texts")
+            vectors = dict(zip(texts, embeddings))
+            with self._lock:
+                self.batches += 1
+                self.requests += len(items)
+            for text, _, future in items:
+                future.set_result(vectors[text])
+        except BaseException as e:
+            self._fail(items, e)
+
+_batcher = EmbeddingBatcher(EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_WORKERS)
+
+def embed_text(text: str, task_type: str = "retrieval_query") -> list[float]:
+    key = _cache_key(text, task_type)
+    embedding = _embedding_cache.get(key)
+    if embedding is not None:
+        return embedding
+    if _embedding_disk_cache is not None:
+        embedding = _embedding_disk_cache.get(key)
+        if embedding is not None:
+            _embedding_cache.set(key, embedding)
+            return embedding
+
     load_embedding_model()
     try:
-        response = genai.embed_content(
-            model="models/gemini-embedding-2",
-            content=text,
-            task_type="retrieval_query",
-            output_dimensionality=768
-        )
-        return response["embedding"]
+        embedding = _batcher.submit(text, task_type).result(timeout=EMBED_QUERY_TIMEOUT_SECONDS)
     except Exception as e:
         logger.error(f"Error generating embedding for text: {e}")
         raise e
 
-def embed_batch(texts: list[str]) -> list[list[float]]:
+    _embedding_cache.set(key, embedding)
+    if _embedding_disk_cache is not None:
+        _embedding_disk_cache.set(key, embedding)
+    return embedding
+
+def embedding_cache_stats() -> dict:
+    stats = {
+        "memory": _embedding_cache.stats(),
+        "batches": _batcher.batches,
+        "batchedRequests": _batcher.requests,
+    }
+    if _embedding_disk_cache is not None:
+        stats["disk"] = _embedding_disk_cache.stats()
+    return stats
+
+def embed_batch_with_stats(texts: list[str], task_type: str = "retrieval_document") -> tuple:
+    """Embeds texts (document chunks by default) in concurrent sub-batches, preserving input order.
+
+    Returns the embeddings and a stats dict with the sub-batch count, elapsed
+    seconds and throughput in chunks/sec.
+    """
     if not texts:
-        return []
+        return [], {"chunks": 0, "subBatches": 0, "seconds": 0.0, "chunksPerSec": 0.0}
     load_embedding_model()
+
+    sub_batches = [texts[i:i + EMBED_SUB_BATCH_SIZE] for i in range(0, len(texts), EMBED_SUB_BATCH_SIZE)]
+    started = time.perf_counter()
     try:
-        response = genai.embed_content(
-            model="models/gemini-embedding-2",
-            content=texts,
-            task_type="retrieval_document",
-            output_dimensionality=768
-        )
-        return response["embedding"]
+        with ThreadPoolExecutor(max_workers=min(EMBED_MAX_WORKERS, len(sub_batches))) as executor:
+            results = list(executor.map(lambda batch: _embed_request(batch, task_type), sub_batches))
     except Exception as e:
         logger.error(f"Error generating embeddings for batch: {e}")
         raise e
+    elapsed = time.perf_counter() - started
 
+    embeddings = [vector for batch in results for vector in batch]
+    stats = {
+        "chunks": len(texts),
+        "subBatches": len(sub_batches),
+        "seconds": round(elapsed, 3),
+        "chunksPerSec": round(len(texts) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logger.info(
+        f"Embedded {stats['chunks']} chunks in {stats['subBatches']} sub-batches "
+        f"({stats['seconds']}s, {stats['chunksPerSec']} chunks/sec)."
+    )
+    return embeddings, stats
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    return embed_batch_with_stats(texts)[0]
@@ -0,0 +1,240 @@
+import os
+import json
+import pickle
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from services.cache import LRUCache
+from services.llm_client import get_llm_client
+from rag.answer_cache import normalize_vector
+from rag.context_builder import dedupe_chunks
+from rag.embedder import embed_batch_with_stats
+from rag.vector_store_base import chunk_point_id, document_slug, matches_scope
+
+logger = logging.getLogger("rag_faq")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAQ_DIR = os.environ.get("FAQ_DIR", os.path.join(BASE_DIR, ".faq"))
+# Off by default: generation costs one LLM call per topic; /ingest-document can opt in per request
+FAQ_ENABLED = os.environ.get("FAQ_ENABLED", "false").lower() == "true"
+FAQ_QUESTIONS_PER_TOPIC = int(os.environ.get("FAQ_QUESTIONS_PER_TOPIC", "3"))
+FAQ_CONCURRENCY = int(os.environ.get("FAQ_CONCURRENCY", "4"))
+FAQ_CONTEXT_CHARS = int(os.environ.get("FAQ_CONTEXT_CHARS", "6000"))
+FAQ_MAX_TOKENS = int(os.environ.get("FAQ_MAX_TOKENS", "1500"))
+# Cosine similarity a student question needs with a stored FAQ question to be served from it
+FAQ_MATCH_THRESHOLD = float(os.environ.get("FAQ_MATCH_THRESHOLD", "0.92"))
+FAQ_CACHE_DOCS = int(os.environ.get("FAQ_CACHE_DOCS", "64"))
+
+# Placeholder the chunker emits for topics with no matching passages
+EMPTY_TOPIC_MARKER = "No specific content matched in study materials."
+
+
+class FaqIndex:
+    """Precomputed question/answer pairs of one document with unit-normalised question embeddings."""
+
+    def __init__(self, source_hash: str, entries: list, vectors: np.ndarray):
+        self.source_hash = source_hash
+        self.entries = entries
+        self.vectors = vectors
+
+    def match(self, embedding, scope: Optional[dict] = None,
+              threshold: float = FAQ_MATCH_THRESHOLD) -> Optional[dict]:
+        """Best entry above threshold; with a scope, only entries of that unit/topic are considered.
+
+        Generic questions ("what is the time complexity?") recur across topics,
+        so an entry from another topic must never answer a scoped question.
+        """
+        rows = [i for i, e in enumerate(self.entries) if not scope or matches_scope(e, scope)]
+        if not rows:
+            return None
+        scores = self.vectors[rows].dot(normalize_vector(embedding))
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return {**self.entries[rows[best]], "similarity": float(scores[best])}
+
+
+def chunks_source_hash(chunks) -> str:
+    """Identifies the chunk set an FAQ was generated from; unchanged documents keep their FAQ."""
+    ids = sorted(chunk_point_id(c) for c in chunks)
+    return hashlib.sha256("|".join(ids).encode("utf-8")).hexdigest()
+
+
+# --- Persistence: one pickle per document, with an LRU of loaded indexes ---
+_loaded = LRUCache(max_items=FAQ_CACHE_DOCS)
+_tasks = {}  # pdfId -> running generation task
+hits = 0
+misses = 0
+
+
+def _index_path(pdfId: str) -> str:
+    return os.path.join(FAQ_DIR, f"{document_slug(pdfId)}.pkl")
+
+
+def save_faq_index(pdfId: str, index: FaqIndex) -> None:
+    os.makedirs(FAQ_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=FAQ_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _index_path(pdfId))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _loaded.set(pdfId, index)
+
+
+def load_faq_index(pdfId: str) -> Optional[FaqIndex]:
+    index = _loaded.get(pdfId)
+    if index is not None:
+        return index
+    try:
+        with open(_index_path(pdfId), "rb") as f:
+            index = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable FAQ index for '{pdfId}': {e}")
+        return None
+    _loaded.set(pdfId, index)
+    return index
+
+
+def delete_faq(pdfId: str) -> None:
+    """Cancels any running generation and removes the document's FAQ."""
+    task = _tasks.pop(pdfId, None)
+    if task is not None and not task.done():
+        task.cancel()
+    _loaded.pop(pdfId)
+    try:
+        os.remove(_index_path(pdfId))
+    except FileNotFoundError:
+        pass
+
+
+def match_faq(pdfId: str, embedding, scope: Optional[dict] = None) -> Optional[dict]:
+    """Returns the FAQ entry within scope whose question is close enough to the embedded question, if any."""
+    global hits, misses
+    index = load_faq_index(pdfId)
+    entry = index.match(embedding, scope) if index is not None else None
+    if entry is None:
+        misses += 1
+        return None
+    hits += 1
+    logger.info(f"FAQ hit for '{pdfId}' (similarity {entry['similarity']:.3f}): {entry['question']}")
+    return entry
+
+
+def faq_stats() -> dict:
+    return {"hits": hits, "misses": misses, "generating": sum(1 for t in _tasks.values() if not t.done())}
+
+
+# --- Generation ---
+def _topic_contexts(chunks) -> list:
+    """Groups chunks by (unitIndex, topicIndex) into (metadata, text) pairs, skipping empty topics."""
+    topics = {}
+    for chunk in chunks:
+        key = (chunk.metadata.get("unitIndex"), chunk.metadata.get("topicIndex"))
+        topics.setdefault(key, []).append(chunk)
+    contexts = []
+    for topic_chunks in topics.values():
+        topic_chunks.sort(key=lambda c: c.metadata.get("chunkIndex", 0))
+        texts = [c["text"] for c in dedupe_chunks([{"text": c.text} for c in topic_chunks])]
+        text = "".join(texts)[:FAQ_CONTEXT_CHARS]
+        if text.rstrip().endswith(EMPTY_TOPIC_MARKER):
+            continue
+        contexts.append((topic_chunks[0].metadata, text))
+    return contexts
+
+
+async def _generate_topic_faq(metadata: dict, text: str, semaphore: asyncio.Semaphore) -> list:
+    title = metadata.get("topicTitle", "")
+    system_prompt = (
+        "You write study FAQs. Using only the provided study material, write "
+        f"{FAQ_QUESTIONS_PER_TOPIC} questions a student is likely to ask about the topic and answer "
+        "each clearly in simple language. Return valid JSON only: an array of objects "
+        'with "question" and "answer" fields.'
+    )
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Topic: {title}\n\nStudy material:\n{text}"},
+    ]
+    async with semaphore:
+        result = await get_llm_client().complete(messages, temperature=0.3, max_tokens=FAQ_MAX_TOKENS)
+    try:
+        pairs = json.loads(result.replace("```json", "").replace("```", "").strip())
+    except json.JSONDecodeError as e:
+        logger.warning(f"Skipping FAQ for topic '{title}': unparseable output ({e}).")
+        return []
+    return [
+        {
+            "question": p["question"].strip(),
+            "answer": p["answer"].strip(),
+            "unitIndex": metadata.get("unitIndex"),
+            "topicIndex": metadata.get("topicIndex"),
+            "topicTitle": title,
+        }
+        for p in pairs
+        if isinstance(p, dict) and p.get("question") and p.get("answer")
+    ]
+
+
+async def generate_faq(pdfId: str, chunks, source_hash: str) -> None:
+    """Generates, embeds and stores the FAQ of a document, FAQ_CONCURRENCY topics at a time."""
+    try:
+        semaphore = asyncio.Semaphore(FAQ_CONCURRENCY)
+        contexts = _topic_contexts(chunks)
+        results = await asyncio.gather(
+            *(_generate_topic_faq(metadata, text, semaphore) for metadata, text in contexts),
+            return_exceptions=True,
+        )
+        entries = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"FAQ generation failed for a topic of '{pdfId}': {result!r}")
+                continue
+            entries.extend(result)
+        if not entries:
+            logger.warning(f"No FAQ entries generated for '{pdfId}'.")
+            return
+        embeddings, _ = await asyncio.to_thread(
+            embed_batch_with_stats, [e["question"] for e in entries], "retrieval_query"
+        )
+        vectors = np.stack([normalize_vector(e) for e in embeddings])
+        # Saved on the loop: a worker thread would still write after a cancel by delete_faq
+        save_faq_index(pdfId, FaqIndex(source_hash, entries, vectors))
+        logger.info(f"Stored {len(entries)} FAQ entries for '{pdfId}' from {len(contexts)} topics.")
+    except asyncio.CancelledError:
+        logger.info(f"FAQ generation for '{pdfId}' cancelled.")
+        raise
+    except Exception as e:
+        logger.error(f"FAQ generation for '{pdfId}' failed: {e}")
+    finally:
+        if _tasks.get(pdfId) is asyncio.current_task():
+            del _tasks[pdfId]
+
+
+def schedule_faq_generation(pdfId: str, chunks, generate: bool = True) -> str:
+    """Starts background FAQ generation unless the stored FAQ already matches these chunks.
+
+    A stored FAQ for other chunks is stale and is dropped either way. Returns
+    "unchanged", "scheduled" or "disabled". Must be called from the event loop.
+    """
+    source_hash = chunks_source_hash(chunks)
+    existing = load_faq_index(pdfId)
+    if existing is not None and existing.source_hash == source_hash:
+        return "unchanged"
+    running = _tasks.get(pdfId)
+    if generate and running is not None and not running.done() and running.get_name() == source_hash:
+        return "scheduled"
+    delete_faq(pdfId)
+    if not generate:
+        return "disabled"
+    _tasks[pdfId] = asyncio.create_task(generate_faq(pdfId, list(chunks), source_hash), name=source_hash)
+    return "scheduled"
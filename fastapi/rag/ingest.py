@@ -0,0 +1,46 @@
+import logging
+
+from rag.bm25_index import BM25Index, save_lexical_index
+from rag.embedder import embed_batch_with_stats
+from rag.vector_store import chunk_point_id, delete_points, get_point_ids, upsert_chunks
+
+logger = logging.getLogger("rag_ingest")
+
+def ingest_chunks(pdfId: str, chunks) -> dict:
+    """Idempotently syncs a document's chunks into the vector store and its BM25 index.
+
+    Point IDs are content hashes, so only chunks whose text or metadata changed
+    since the last ingest are embedded, and only points no longer produced by
+    the chunker are deleted.
+    """
+    wanted = {}
+    for chunk in chunks:
+        wanted.setdefault(chunk_point_id(chunk), chunk)
+
+    existing = get_point_ids(pdfId)
+    new_chunks = [chunk for point_id, chunk in wanted.items() if point_id not in existing]
+    stale_ids = existing - wanted.keys()
+
+    embeddings, embedding_stats = embed_batch_with_stats([c.text for c in new_chunks])
+    # Upsert before deleting so searches never see a half-empty document
+    upsert_chunks(pdfId, new_chunks, embeddings)
+    delete_points(pdfId, stale_ids)
+    # The lexical index is cheap to rebuild, so it always covers the full chunk set
+    save_lexical_index(pdfId, BM25Index.build(
+        list(wanted.keys()),
+        [c.text for c in wanted.values()],
+        [c.metadata for c in wanted.values()],
+    ))
+
+    stats = {
+        "chunks": len(wanted),
+        "embedded": len(new_chunks),
+        "unchanged": len(wanted) - len(new_chunks),
+        "deleted": len(stale_ids),
+        "embedding": embedding_stats,
+    }
+    logger.info(
+        f"Ingested '{pdfId}': {stats['embedded']} embedded, {stats['unchanged']} unchanged, "
+        f"{stats['deleted']} deleted."
+    )
+    return stats
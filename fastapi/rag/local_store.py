@@ -0,0 +1,192 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+from services.cache import LRUCache
+from rag.vector_store_base import SCOPE_FIELDS, VectorStore, chunk_point_id, document_slug
+
+logger = logging.getLogger("local_vector_store")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_VECTOR_DIR = os.environ.get("LOCAL_VECTOR_DIR", os.path.join(BASE_DIR, ".vectors"))
+# float16 halves the on-disk size; vectors are upcast to float32 once per load, because
+# NumPy has no BLAS path for float16 and a float16 dot product is ~30x slower
+LOCAL_VECTOR_DTYPE = os.environ.get("LOCAL_VECTOR_DTYPE", "float16")
+LOCAL_VECTOR_CACHE_DOCS = int(os.environ.get("LOCAL_VECTOR_CACHE_DOCS", "64"))
+
+
+class _Document:
+    """Immutable snapshot of one document: float32 unit vectors plus payloads."""
+
+    def __init__(self, vectors: np.ndarray, payloads: list):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.payloads = payloads
+        self.ids = [p["id"] for p in payloads]
+        # Scope fields as arrays so filtered searches are a vectorised mask (-1 when absent)
+        self.scope_columns = {
+            field: np.array([p["metadata"].get(field, -1) for p in payloads], dtype=object)
+            for field in SCOPE_FIELDS
+        }
+
+    def scope_mask(self, scope: dict) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, value in scope.items():
+            mask &= self.scope_columns[field] == value
+        return mask
+
+
+class LocalVectorStore(VectorStore):
+    """Single-node vector store keeping each document in `<dir>/<pdfId>/`.
+
+    vectors.npy holds L2-normalised embeddings (LOCAL_VECTOR_DTYPE on disk) and
+    payloads.json the matching id/text/metadata rows. Search is an exact
+    vectorised dot product with argpartition top-k.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = LOCAL_VECTOR_DIR, dtype: str = LOCAL_VECTOR_DTYPE):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._documents = LRUCache(max_items=LOCAL_VECTOR_CACHE_DOCS)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _doc_dir(self, pdfId: str) -> str:
+        return os.path.join(self.directory, document_slug(pdfId))
+
+    def _lock(self, pdfId: str) -> threading.RLock:
+        # Reentrant: writers hold it while calling _load
+        with self._locks_guard:
+            return self._locks.setdefault(pdfId, threading.RLock())
+
+    def _load(self, pdfId: str):
+        """Returns the document snapshot, loading it lazily on first use.
+
+        Files are read under the document lock, so a load never pairs the
+        vectors of one write with the payloads of another.
+        """
+        document = self._documents.get(pdfId)
+        if document is not None:
+            return document
+        with self._lock(pdfId):
+            document = self._documents.get(pdfId)
+            if document is not None:
+                return document
+            doc_dir = self._doc_dir(pdfId)
+            vectors_path = os.path.join(doc_dir, "vectors.npy")
+            payloads_path = os.path.join(doc_dir, "payloads.json")
+            if not os.path.exists(vectors_path) or not os.path.exists(payloads_path):
+                return None
+            vectors = np.load(vectors_path)
+            with open(payloads_path, "r", encoding="utf-8") as f:
+                payloads = json.load(f)
+            if len(payloads) != vectors.shape[0]:
+                raise ValueError(f"Local vector store for '{pdfId}' is inconsistent; re-ingest the document.")
+            document = _Document(vectors, payloads)
+            self._documents.set(pdfId, document)
+            return document
+
+    def _write(self, pdfId: str, vectors: np.ndarray, payloads: list) -> None:
+        """Replaces both files and drops the cached snapshot; callers hold the document lock."""
+        doc_dir = self._doc_dir(pdfId)
+        os.makedirs(doc_dir, exist_ok=True)
+        # Payloads are replaced last; a file left half-written by a crash fails _load's length check
+        for filename, writer in (
+            ("vectors.npy", lambda f: np.save(f, vectors.astype(self.dtype, copy=False))),
+            ("payloads.json", lambda f: f.write(json.dumps(payloads, ensure_ascii=False).encode("utf-8"))),
+        ):
+            fd, tmp_path = tempfile.mkstemp(dir=doc_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, os.path.join(doc_dir, filename))
+        self._documents.pop(pdfId)
+
+    def create(self, pdfId: str) -> None:
+        os.makedirs(self._doc_dir(pdfId), exist_ok=True)
+
+    def exists(self, pdfId: str) -> bool:
+        return os.path.exists(os.path.join(self._doc_dir(pdfId), "payloads.json"))
+
+    def point_ids(self, pdfId: str) -> set:
+        document = self._load(pdfId)
+        return set(document.ids) if document else set()
+
+    def delete_points(self, pdfId: str, point_ids) -> None:
+        point_ids = set(point_ids)
+        if not point_ids:
+            return
+        with self._lock(pdfId):
+            document = self._load(pdfId)
+            if document is None:
+                return
+            keep = [i for i, pid in enumerate(document.ids) if pid not in point_ids]
+            self._write(pdfId, np.asarray(document.vectors[keep]), [document.payloads[i] for i in keep])
+        logger.info(f"Deleted {len(point_ids)} stale points for '{pdfId}'.")
+
+    def upsert(self, pdfId: str, chunks, embeddings: list) -> None:
+        if not chunks:
+            return
+        new_vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        new_vectors /= norms
+        new_payloads = [
+            {"id": chunk_point_id(c), "text": c.text, "metadata": {**c.metadata, "pdfId": pdfId}}
+            for c in chunks
+        ]
+        with self._lock(pdfId):
+            document = self._load(pdfId)
+            if document is not None:
+                replaced = {p["id"] for p in new_payloads}
+                keep = [i for i, pid in enumerate(document.ids) if pid not in replaced]
+                new_vectors = np.vstack([document.vectors[keep], new_vectors])
+                new_payloads = [document.payloads[i] for i in keep] + new_payloads
+            self._write(pdfId, new_vectors, new_payloads)
+        logger.info(f"Upserted {len(chunks)} chunks to local store for '{pdfId}'.")
+
+    def search(self, pdfId: str, query_embedding: list, top_k: int, scope: dict = None) -> list:
+        document = self._load(pdfId)
+        if document is None:
+            raise ValueError(f"Document '{pdfId}' does not exist in the local vector store.")
+        n_points = len(document.ids)
+        if n_points == 0 or top_k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query /= norm
+        if scope:
+            rows = np.flatnonzero(document.scope_mask(scope))
+            vectors = document.vectors[rows]
+        else:
+            rows = np.arange(n_points)
+            vectors = document.vectors
+        scores = np.full(n_points, -np.inf, dtype=np.float32)
+        scores[rows] = vectors.dot(query)
+        if top_k < len(rows):
+            candidates = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+        else:
+            candidates = rows
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {
+                "id": document.ids[i],
+                "text": document.payloads[i]["text"],
+                "metadata": document.payloads[i]["metadata"],
+                "score": float(scores[i]),
+            }
+            for i in ranked
+        ]
+
+    def delete(self, pdfId: str) -> None:
+        with self._lock(pdfId):
+            self._documents.pop(pdfId)
+            shutil.rmtree(self._doc_dir(pdfId), ignore_errors=True)
+        logger.info(f"Deleted local vectors for '{pdfId}'.")
@@ -0,0 +1,24 @@
+"""Moves per-document `pdf_*` Qdrant collections into the shared collection.
+
+Usage (from the fastapi directory):
+    python -m rag.migrate_collections [--delete-source]
+"""
+import argparse
+import json
+import logging
+
+from rag.qdrant_store import QDRANT_SHARED_COLLECTION, QdrantVectorStore
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--delete-source",
+        action="store_true",
+        help="delete each per-document collection after copying it",
+    )
+    args = parser.parse_args()
+    stats = QdrantVectorStore(storage_mode="shared").migrate_to_shared_collection(
+        delete_source=args.delete_source
+    )
+    print(f"Migrated into '{QDRANT_SHARED_COLLECTION}': {json.dumps(stats)}")
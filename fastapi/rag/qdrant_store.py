@@ -0,0 +1,312 @@
+import os
+import logging
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    VectorParams,
+)
+
+from rag.vector_store_base import SCOPE_FIELDS, VECTOR_SIZE, VectorStore, chunk_point_id, point_id
+
+# Load environment variables
+load_dotenv()
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+logger = logging.getLogger("qdrant_store")
+
+# Load env settings
+QDRANT_URL = os.environ.get("QDRANT_URL", "")
+QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY", "")
+
+# "per_document" keeps one collection per PDF; "shared" stores every PDF in one
+# collection and filters on the indexed metadata.pdfId payload field
+QDRANT_STORAGE_MODE = os.environ.get("QDRANT_STORAGE_MODE", "per_document").lower()
+QDRANT_SHARED_COLLECTION = os.environ.get("QDRANT_SHARED_COLLECTION", "adept_chunks")
+
+# Initialize Client with local/cloud fallback
+def get_qdrant_client():
+    if QDRANT_URL:
+        try:
+            logger.info(f"Connecting to Qdrant at {QDRANT_URL}...")
+            client = QdrantClient(
+                url=QDRANT_URL,
+                api_key=QDRANT_API_KEY or None,
+                timeout=30
+            )
+            # Basic connectivity check
+            client.get_collections()
+            logger.info("Connected to Qdrant successfully.")
+            return client
+        except Exception as e:
+            logger.error(
+                f"CRITICAL: Qdrant connection to {QDRANT_URL} failed: {e}. "
+                "Failing fast to prevent silent data loss."
+            )
+            raise e
+            
+    logger.warning("QDRANT_URL not configured. Initializing in-memory Qdrant client (VECTORS WILL NOT PERSIST)...")
+    return QdrantClient(":memory:")
+
+def document_collection_name(pdfId: str) -> str:
+    return f"pdf_{pdfId.replace('-', '_')}"
+
+class QdrantVectorStore(VectorStore):
+    name = "qdrant"
+
+    def __init__(self, client=None, storage_mode: str = QDRANT_STORAGE_MODE,
+                 shared_collection: str = QDRANT_SHARED_COLLECTION):
+        self.client = client or get_qdrant_client()
+        self.storage_mode = storage_mode
+        self.shared_collection = shared_collection
+        self._shared_collection_ready = False
+        self._scope_indexed = set()
+
+    def is_shared_mode(self) -> bool:
+        return self.storage_mode == "shared"
+
+    def _collection_name(self, pdfId: str) -> str:
+        return self.shared_collection if self.is_shared_mode() else document_collection_name(pdfId)
+
+    def _document_filter(self, pdfId: str, scope: dict = None):
+        """Restricts operations to one document (shared mode) and optionally a unit/topic scope."""
+        conditions = []
+        if self.is_shared_mode():
+            conditions.append(FieldCondition(key="metadata.pdfId", match=MatchValue(value=pdfId)))
+        for field, value in (scope or {}).items():
+            conditions.append(FieldCondition(key=f"metadata.{field}", match=MatchValue(value=value)))
+        return Filter(must=conditions) if conditions else None
+
+    def _ensure_scope_indexes(self, collection_name: str) -> None:
+        """Indexes the scope fields of a per-document collection once per process."""
+        if collection_name in self._scope_indexed:
+            return
+        for field in SCOPE_FIELDS:
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=f"metadata.{field}",
+                field_schema=PayloadSchemaType.INTEGER
+            )
+        self._scope_indexed.add(collection_name)
+
+    def ensure_shared_collection(self) -> None:
+        """Creates the shared collection and its payload indexes once per process."""
+        if self._shared_collection_ready:
+            return
+        try:
+            if not self.client.collection_exists(self.shared_collection):
+                self.client.create_collection(
+                    collection_name=self.shared_collection,
+                    vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+                )
+                logger.info(f"Shared collection '{self.shared_collection}' created.")
+            self.client.create_payload_index(
+                collection_name=self.shared_collection,
+                field_name="metadata.pdfId",
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+            self._ensure_scope_indexes(self.shared_collection)
+            self._shared_collection_ready = True
+        except Exception as e:
+            logger.error(f"Error preparing shared collection '{self.shared_collection}': {e}")
+            raise e
+
+    def create(self, pdfId: str) -> None:
+        if self.is_shared_mode():
+            self.ensure_shared_collection()
+            return
+        collection_name = document_collection_name(pdfId)
+        try:
+            if not self.client.collection_exists(collection_name):
+                self.client.create_collection(
+                    collection_name=collection_name,
+                    vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+                )
+                logger.info(f"Collection '{collection_name}' created.")
+            self._ensure_scope_indexes(collection_name)
+        except Exception as e:
+            logger.error(f"Error creating collection '{collection_name}': {e}")
+            raise e
+
+    def exists(self, pdfId: str) -> bool:
+        try:
+            if self.is_shared_mode():
+                self.ensure_shared_collection()
+                result = self.client.count(
+                    collection_name=self.shared_collection,
+                    count_filter=self._document_filter(pdfId),
+                    exact=False
+                )
+                return result.count > 0
+            return self.client.collection_exists(document_collection_name(pdfId))
+        except Exception:
+            return False
+
+    def point_ids(self, pdfId: str) -> set:
+        collection_name = self._collection_name(pdfId)
+        if self.is_shared_mode():
+            self.ensure_shared_collection()
+        elif not self.exists(pdfId):
+            return set()
+        point_ids = set()
+        offset = None
+        try:
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=self._document_filter(pdfId),
+                    limit=1000,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False
+                )
+                point_ids.update(str(p.id) for p in points)
+                if offset is None:
+                    return point_ids
+        except Exception as e:
+            logger.error(f"Error listing points in collection '{collection_name}': {e}")
+            raise e
+
+    def delete_points(self, pdfId: str, point_ids) -> None:
+        collection_name = self._collection_name(pdfId)
+        point_ids = list(point_ids)
+        if not point_ids:
+            return
+        # Collections written before content-hash IDs used integer point IDs
+        point_ids = [int(p) if p.isdigit() else p for p in point_ids]
+        try:
+            self.client.delete(collection_name=collection_name, points_selector=PointIdsList(points=point_ids))
+            logger.info(f"Deleted {len(point_ids)} stale points from collection '{collection_name}'.")
+        except Exception as e:
+            logger.error(f"Error deleting points from collection '{collection_name}': {e}")
+            raise e
+
+    def upsert(self, pdfId: str, chunks, embeddings: list[list[float]]) -> None:
+        collection_name = self._collection_name(pdfId)
+        self.create(pdfId)
+
+        points = []
+        for chunk, embedding in zip(chunks, embeddings):
+            points.append(
+                PointStruct(
+                    id=chunk_point_id(chunk),
+                    vector=embedding,
+                    payload={
+                        "text": chunk.text,
+                        "metadata": {**chunk.metadata, "pdfId": pdfId}
+                    }
+                )
+            )
+        if not points:
+            return
+        try:
+            self.client.upsert(collection_name=collection_name, points=points)
+            logger.info(f"Upserted {len(points)} chunks to collection '{collection_name}'.")
+        except Exception as e:
+            logger.error(f"Error upserting to collection '{collection_name}': {e}")
+            raise e
+
+    def search(self, pdfId: str, query_embedding: list[float], top_k: int, scope: dict = None) -> list:
+        collection_name = self._collection_name(pdfId)
+        if self.is_shared_mode():
+            self.ensure_shared_collection()
+        elif not self.exists(pdfId):
+            raise ValueError(f"Collection '{collection_name}' does not exist.")
+        elif scope:
+            # Collections created before scoped search have no payload indexes yet
+            self._ensure_scope_indexes(collection_name)
+
+        try:
+            results = self.client.query_points(
+                collection_name=collection_name,
+                query=query_embedding,
+                query_filter=self._document_filter(pdfId, scope),
+                limit=top_k
+            )
+            search_results = []
+            for r in results.points:
+                payload = r.payload or {}
+                search_results.append({
+                    "id": str(r.id),
+                    "text": payload.get("text", ""),
+                    "metadata": payload.get("metadata", {}),
+                    "score": r.score
+                })
+            return search_results
+        except Exception as e:
+            logger.error(f"Error searching collection '{collection_name}': {e}")
+            raise e
+
+    def delete(self, pdfId: str) -> None:
+        collection_name = self._collection_name(pdfId)
+        try:
+            if self.is_shared_mode():
+                self.ensure_shared_collection()
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=FilterSelector(filter=self._document_filter(pdfId))
+                )
+                logger.info(f"Deleted points of '{pdfId}' from shared collection '{collection_name}'.")
+            elif self.client.collection_exists(collection_name):
+                self.client.delete_collection(collection_name=collection_name)
+                logger.info(f"Deleted collection '{collection_name}'.")
+        except Exception as e:
+            logger.error(f"Error deleting collection '{collection_name}': {e}")
+            raise e
+
+    def migrate_to_shared_collection(self, delete_source: bool = False) -> dict:
+        """Copies every per-document `pdf_*` collection into the shared collection.
+
+        Points are re-keyed with content-hash IDs (legacy integer IDs collide
+        across documents); vectors and payloads are copied as-is.
+        """
+        self.ensure_shared_collection()
+        stats = {"collections": 0, "points": 0, "skipped": []}
+        for description in self.client.get_collections().collections:
+            source = description.name
+            if not source.startswith("pdf_") or source == self.shared_collection:
+                continue
+            offset = None
+            copied = 0
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=source,
+                    limit=256,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+                batch = []
+                for p in points:
+                    payload = p.payload or {}
+                    metadata = payload.get("metadata", {})
+                    if not metadata.get("pdfId"):
+                        continue
+                    batch.append(PointStruct(
+                        id=point_id(payload.get("text", ""), metadata),
+                        vector=p.vector,
+                        payload=payload
+                    ))
+                if batch:
+                    self.client.upsert(collection_name=self.shared_collection, points=batch)
+                    copied += len(batch)
+                if offset is None:
+                    break
+            if copied == 0:
+                stats["skipped"].append(source)
+                logger.warning(f"Skipped '{source}': no points with a metadata.pdfId payload.")
+                continue
+            stats["collections"] += 1
+            stats["points"] += copied
+            logger.info(f"Migrated {copied} points from '{source}' into '{self.shared_collection}'.")
+            if delete_source:
+                self.client.delete_collection(collection_name=source)
+                logger.info(f"Deleted source collection '{source}'.")
+        return stats
@@ -1,25 +1,101 @@
+import os
 import logging
+from typing import Optional
+from rag.bm25_index import load_lexical_index
 from rag.embedder import embed_text
 from rag.vector_store import collection_exists, search
 
 logger = logging.getLogger("rag_retriever")
 
-def retrieve(pdfId: str, query: str, top_k: int = 4) -> list:
-    logger.info(f"Retrieving top {top_k} chunks for query in document {pdfId}...")
+# Dense results are fused with BM25 results by reciprocal-rank fusion
+HYBRID_RETRIEVAL = os.environ.get("HYBRID_RETRIEVAL", "true").lower() == "true"
+RRF_K = int(os.environ.get("RRF_K", "60"))
+# Each retriever contributes top_k * HYBRID_CANDIDATE_FACTOR candidates to the fusion
+HYBRID_CANDIDATE_FACTOR = int(os.environ.get("HYBRID_CANDIDATE_FACTOR", "2"))
+# Full coverage of the query's (IDF-weighted) terms adds at most this much to the dense
+# similarity; kept small so keyword overlap alone can never clear RAG_SIMILARITY_THRESHOLD
+LEXICAL_CONFIDENCE_BOOST = float(os.environ.get("LEXICAL_CONFIDENCE_BOOST", "0.1"))
+# A topic-scoped search is widened to the whole document below this confidence
+RAG_SCOPE_MIN_SCORE = float(os.environ.get("RAG_SCOPE_MIN_SCORE", os.environ.get("RAG_SIMILARITY_THRESHOLD", "0.65")))
+
+def fuse_results(query: str, dense: list, index, top_k: int, scope: Optional[dict] = None) -> list:
+    """Reciprocal-rank fusion of dense hits with the document's BM25 hits.
+
+    Each result keeps its dense cosine "score" (0.0 for lexical-only hits) and
+    gains "rrfScore", "lexicalScore" and "confidence": the dense score raised by
+    up to LEXICAL_CONFIDENCE_BOOST for lexical coverage of the query.
+    """
+    candidates = top_k * HYBRID_CANDIDATE_FACTOR
+    fused = {}
+    for rank, result in enumerate(dense):
+        fused[result["id"]] = {**result, "rrfScore": 1.0 / (RRF_K + rank + 1), "lexicalScore": 0.0}
+    for rank, (row, bm25_score) in enumerate(index.query(query, candidates, scope)):
+        point_id = index.ids[row]
+        entry = fused.get(point_id)
+        if entry is None:
+            entry = fused[point_id] = {
+                "id": point_id,
+                "text": index.texts[row],
+                "metadata": index.metadata[row],
+                "score": 0.0,
+                "rrfScore": 0.0,
+            }
+        entry["rrfScore"] += 1.0 / (RRF_K + rank + 1)
+        entry["lexicalScore"] = bm25_score
+
+    results = sorted(fused.values(), key=lambda x: x["rrfScore"], reverse=True)[:top_k]
+    rows = [index.rows.get(r["id"]) for r in results]
+    known = [i for i, row in enumerate(rows) if row is not None]
+    coverage = index.coverage(query, [rows[i] for i in known])
+    lexical_coverage = [0.0] * len(results)
+    for i, value in zip(known, coverage):
+        lexical_coverage[i] = float(value)
+    for result, value in zip(results, lexical_coverage):
+        result["confidence"] = min(1.0, result["score"] + LEXICAL_CONFIDENCE_BOOST * value)
+    return results
+
+def _search(pdfId: str, query: str, top_k: int, query_embedding: list, index, scope: Optional[dict]) -> list:
+    candidates = top_k * HYBRID_CANDIDATE_FACTOR if index is not None else top_k
+    results = search(pdfId, query_embedding, candidates, scope)
+    # Sort results by score descending (Qdrant search already returns sorted results, but we verify)
+    results.sort(key=lambda x: x["score"], reverse=True)
+    if index is None:
+        for result in results:
+            result["confidence"] = result["score"]
+        return results
+    # Fuse with the lexical ranking
+    return fuse_results(query, results, index, top_k, scope)
+
+def retrieve(pdfId: str, query: str, top_k: int = 4, query_embedding: Optional[list] = None,
+             scope: Optional[dict] = None) -> list:
+    """Returns the best chunks for the query, each with a "confidence" used for the web fallback decision.
+
+    With a scope such as {"unitIndex": 1, "topicIndex": 2} the search first
+    runs over that topic's chunks only, and is widened to the whole document
+    when the scoped confidence is below RAG_SCOPE_MIN_SCORE.
+    """
+    logger.info(f"Retrieving top {top_k} chunks for query in document {pdfId} (scope {scope})...")
     
-    # Check if collection exists
-    if not collection_exists(pdfId):
-        raise ValueError("Document not yet ingested. Please wait for processing to complete.")
-        
     try:
-        # 1. Embed query
-        query_embedding = embed_text(query)
-        
-        # 2. Search collection
-        results = search(pdfId, query_embedding, top_k)
+        index = load_lexical_index(pdfId) if HYBRID_RETRIEVAL else None
+
+        # 1. Embed query (unless the caller already did)
+        if query_embedding is None:
+            query_embedding = embed_text(query)
+
+        # 2. Scoped search first
+        if scope:
+            results = _search(pdfId, query, top_k, query_embedding, index, scope)
+            best = max((r["confidence"] for r in results), default=0.0)
+            if best >= RAG_SCOPE_MIN_SCORE:
+                return results
+            logger.info(f"Scoped confidence {best:.3f} below {RAG_SCOPE_MIN_SCORE}; widening to the whole document.")
         
-        # 3. Sort results by score descending (Qdrant search already returns sorted results, but we verify)
-        results.sort(key=lambda x: x["score"], reverse=True)
+        # 3. Search the whole document. Only an empty result needs the (extra round-trip)
+        # existence check, to tell "not ingested yet" apart from "no matches".
+        results = _search(pdfId, query, top_k, query_embedding, index, None)
+        if not results and not collection_exists(pdfId):
+            raise ValueError("Document not yet ingested. Please wait for processing to complete.")
         return results
     except Exception as e:
         logger.error(f"Error retrieving context for pdfId '{pdfId}': {e}")
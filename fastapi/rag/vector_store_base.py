@@ -0,0 +1,72 @@
+import re
+import json
+import uuid
+import hashlib
+from abc import ABC, abstractmethod
+
+VECTOR_SIZE = 768
+
+
+def point_id(text: str, metadata: dict) -> str:
+    """Deterministic point ID derived from chunk text and metadata."""
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return str(uuid.UUID(bytes=hashlib.sha256(payload.encode("utf-8")).digest()[:16]))
+
+
+def chunk_point_id(chunk) -> str:
+    return point_id(chunk.text, chunk.metadata)
+
+
+def document_slug(pdfId: str) -> str:
+    """Filesystem-safe name for a document; a hash suffix keeps sanitised IDs unique."""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", pdfId)
+    if safe != pdfId:
+        safe = f"{safe}-{hashlib.sha256(pdfId.encode('utf-8')).hexdigest()[:8]}"
+    return safe
+
+
+# Chunk metadata fields a search can be scoped to (all indexed in Qdrant)
+SCOPE_FIELDS = ("unitIndex", "topicIndex")
+
+
+def matches_scope(metadata: dict, scope: dict) -> bool:
+    return all(metadata.get(field) == value for field, value in scope.items())
+
+
+class VectorStore(ABC):
+    """Storage backend for per-document chunk embeddings.
+
+    search() returns dicts with "id", "text", "metadata" and a cosine "score",
+    best first. An optional scope such as {"unitIndex": 1, "topicIndex": 2}
+    restricts it to chunks whose metadata matches every given field.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def create(self, pdfId: str) -> None:
+        ...
+
+    @abstractmethod
+    def exists(self, pdfId: str) -> bool:
+        ...
+
+    @abstractmethod
+    def point_ids(self, pdfId: str) -> set:
+        ...
+
+    @abstractmethod
+    def delete_points(self, pdfId: str, point_ids) -> None:
+        ...
+
+    @abstractmethod
+    def upsert(self, pdfId: str, chunks, embeddings: list) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, pdfId: str, query_embedding: list, top_k: int, scope: dict = None) -> list:
+        ...
+
+    @abstractmethod
+    def delete(self, pdfId: str) -> None:
+        ...
@@ -0,0 +1,207 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("cache")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_ROOT = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+_MISSING = object()
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Returns the hex SHA-256 digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, max_items: int = 128, ttl_seconds: float = None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"items": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+    """Pickle-per-key directory cache, evicting least recently used files past max_bytes.
+
+    With ttl_seconds set, entries are stored with their write time and
+    treated as missing once expired.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache file '{path}': {e}")
+            self.delete(key)
+            self.misses += 1
+            return default
+        if self.ttl_seconds is not None:
+            stored_at, value = value
+            if time.time() - stored_at > self.ttl_seconds:
+                self.delete(key)
+                self.misses += 1
+                return default
+        # Touch so eviction treats the file as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            if self.ttl_seconds is not None:
+                value = (time.time(), value)
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cache file '{path}' ({size} bytes).")
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """LRU memory tier in front of a size-bounded disk tier."""
+
+    def __init__(self, name: str, max_items: int, max_disk_bytes: int, ttl_seconds: float = None):
+        self.name = name
+        self.memory = LRUCache(max_items=max_items, ttl_seconds=ttl_seconds)
+        self.disk = DiskCache(os.path.join(CACHE_ROOT, name), max_disk_bytes, ttl_seconds=ttl_seconds)
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.disk.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value) -> None:
+        self.memory.set(key, value)
+        try:
+            self.disk.set(key, value)
+        except Exception as e:
+            logger.warning(f"Failed to persist '{self.name}' cache entry {key}: {e}")
+
+    def delete(self, key: str) -> None:
+        self.memory.pop(key)
+        self.disk.delete(key)
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger("job_store")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(BASE_DIR, ".data", "jobs.sqlite3"))
+
+ACTIVE_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobStore:
+    """Persistent SQLite store for background jobs, their progress events and results."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    events TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_hash ON jobs (kind, content_hash)")
+
+    @staticmethod
+    def _to_dict(row) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["events"] = json.loads(job["events"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def create_or_get(self, kind: str, content_hash: str, reuse_succeeded: bool = True,
+                      succeeded_max_age: Optional[float] = None) -> tuple:
+        """Returns (job, created). A queued or running job with the same hash is reused, and
+        so is a succeeded one unless reuse_succeeded is False or it finished more than
+        succeeded_max_age seconds ago."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND content_hash = ? "
+                f"AND (status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) "
+                "OR (status = 'succeeded' AND ? AND updated_at >= ?)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (kind, content_hash, *ACTIVE_STATUSES, int(reuse_succeeded),
+                 now - succeeded_max_age if succeeded_max_age is not None else 0),
+            ).fetchone()
+            if row is not None:
+                return self._to_dict(row), False
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, content_hash, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, content_hash, now, now),
+            )
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row), True
+
+    def add_event(self, job_id: str, stage: str, message: str) -> None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT events FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            events = json.loads(row["events"])
+            events.append({"stage": stage, "message": message, "at": now})
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, events = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(events), now, job_id),
+            )
+
+    def set_status(self, job_id: str, status: str, result=None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def fail_interrupted(self) -> int:
+        """Marks jobs left queued/running by a previous process as failed; their inputs are gone."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', updated_at = ? "
+                "WHERE status IN ('queued', 'running')",
+                (time.time(),),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Marked {cursor.rowcount} interrupted jobs as failed.")
+        return cursor.rowcount
@@ -0,0 +1,234 @@
+import os
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+logger = logging.getLogger("llm_client")
+
+# "groq" talks to Groq (or any OpenAI-compatible server at GROQ_BASE_URL); "fake" needs no network
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq").lower()
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+GROQ_PRIMARY_MODEL = os.environ.get("GROQ_PRIMARY_MODEL", "llama-3.3-70b-versatile")
+GROQ_FALLBACK_MODEL = os.environ.get("GROQ_FALLBACK_MODEL", "llama-3.1-8b-instant")
+GROQ_MAX_CONCURRENCY = int(os.environ.get("GROQ_MAX_CONCURRENCY", "16"))
+GEMINI_VISION_MODEL = os.environ.get("GEMINI_VISION_MODEL", "gemini-3.5-flash")
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "32"))
+
+
+class ChatProvider(ABC):
+    """A chat-completion backend with its own concurrency limit and timeout."""
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+
+    @abstractmethod
+    async def complete(self, model: str, messages: list, temperature: float, max_tokens: Optional[int]) -> str:
+        """Returns the full completion text."""
+
+    @abstractmethod
+    def stream(self, model: str, messages: list, temperature: float, max_tokens: Optional[int]) -> AsyncIterator[str]:
+        """Yields completion tokens; closing the iterator should abort generation."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class GroqProvider(ChatProvider):
+    name = "groq"
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        super().__init__(max_concurrency, timeout)
+        import httpx
+        from groq import AsyncGroq
+
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+        self._client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            base_url=GROQ_BASE_URL,
+            http_client=self._http,
+            max_retries=0,  # retries are handled by the model fallback policy
+        )
+
+    async def complete(self, model, messages, temperature, max_tokens):
+        response = await self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content or ""
+
+    async def stream(self, model, messages, temperature, max_tokens):
+        completion = await self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        try:
+            async for chunk in completion:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        finally:
+            # Closing the response aborts generation upstream if we stop early
+            await completion.response.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+class FakeProvider(ChatProvider):
+    """Offline provider for local runs and tests.
+
+    Returns a scripted response (or echoes the last user message) and can be
+    told to fail for given models to exercise the fallback policy.
+    """
+
+    name = "fake"
+
+    def __init__(self, max_concurrency: int = 64, timeout: float = 5.0, response: Optional[str] = None,
+                 fail_models=(), delay: float = 0.0):
+        super().__init__(max_concurrency, timeout)
+        self.response = response if response is not None else os.environ.get("LLM_FAKE_RESPONSE")
+        self.fail_models = set(fail_models)
+        self.delay = delay
+        self.calls: List[str] = []
+
+    def _answer(self, model, messages) -> str:
+        self.calls.append(model)
+        if model in self.fail_models:
+            raise RuntimeError(f"Fake provider configured to fail for model '{model}'")
+        if self.response is not None:
+            return self.response
+        user_turns = [m["content"] for m in messages if m.get("role") == "user"]
+        return user_turns[-1] if user_turns else ""
+
+    async def complete(self, model, messages, temperature, max_tokens):
+        await asyncio.sleep(self.delay)
+        return self._answer(model, messages)
+
+    async def stream(self, model, messages, temperature, max_tokens):
+        answer = self._answer(model, messages)
+        for word in answer.split(" "):
+            await asyncio.sleep(self.delay)
+            yield word + " "
+
+
+class LLMClient:
+    """Chat client applying the primary/fallback model policy on top of a provider."""
+
+    def __init__(self, provider: ChatProvider, models: Optional[List[str]] = None):
+        self.provider = provider
+        self.models = models or [GROQ_PRIMARY_MODEL, GROQ_FALLBACK_MODEL]
+
+    async def complete(self, messages: list, temperature: float = 0.2, max_tokens: Optional[int] = 1024) -> str:
+        last_error = None
+        for model in self.models:
+            try:
+                async with self.provider.semaphore:
+                    text = await asyncio.wait_for(
+                        self.provider.complete(model, messages, temperature, max_tokens),
+                        timeout=self.provider.timeout,
+                    )
+                return text.strip()
+            except Exception as e:
+                last_error = e
+                logger.warning(f"{self.provider.name} model {model} failed: {e!r}")
+        logger.error(f"All {self.provider.name} models failed: {last_error!r}")
+        raise last_error
+
+    async def stream(self, messages: list, temperature: float = 0.3,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Streams tokens, falling back to the next model only if nothing was emitted yet."""
+        for i, model in enumerate(self.models):
+            emitted = False
+            try:
+                async with self.provider.semaphore:
+                    logger.info(f"Streaming from {self.provider.name} model {model}...")
+                    async for token in self.provider.stream(model, messages, temperature, max_tokens):
+                        emitted = True
+                        yield token
+                return
+            except Exception as e:
+                if emitted or i == len(self.models) - 1:
+                    logger.error(f"{self.provider.name} stream from {model} failed: {e!r}")
+                    raise
+                logger.warning(f"{self.provider.name} model {model} failed: {e!r}. Trying fallback...")
+
+
+_llm_client: Optional[LLMClient] = None
+
+
+def create_provider(name: str = LLM_PROVIDER) -> ChatProvider:
+    if name == "fake":
+        return FakeProvider()
+    if name == "groq":
+        return GroqProvider(GROQ_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+
+
+def get_llm_client() -> LLMClient:
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient(create_provider())
+    return _llm_client
+
+
+def set_llm_client(client: Optional[LLMClient]) -> None:
+    """Overrides the shared client, e.g. with a FakeProvider-backed one in tests."""
+    global _llm_client
+    _llm_client = client
+
+
+async def close_llm_client() -> None:
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.provider.aclose()
+        _llm_client = None
+
+
+# --- Gemini vision ---
+_gemini_model = None
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+
+def _get_gemini_model():
+    global _gemini_model
+    if _gemini_model is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+        _gemini_model = genai.GenerativeModel(GEMINI_VISION_MODEL)
+    return _gemini_model
+
+
+async def generate_vision_text(prompt: str, image) -> str:
+    """Runs a Gemini vision prompt over an image (PIL image or {"mime_type", "data"} blob)
+    under the Gemini concurrency limit."""
+    if LLM_PROVIDER == "fake":
+        return os.environ.get("LLM_FAKE_VISION_RESPONSE", "")
+    async with _gemini_semaphore:
+        response = await asyncio.wait_for(
+            _get_gemini_model().generate_content_async([prompt, image]),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+    return (getattr(response, "text", "") or "").strip()
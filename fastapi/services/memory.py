@@ -0,0 +1,112 @@
+import os
+import sys
+import glob
+import logging
+import threading
+
+logger = logging.getLogger("memory")
+
+_STATUS = "/proc/self/status"
+MEMORY_SAMPLE_INTERVAL_MS = float(os.environ.get("MEMORY_SAMPLE_INTERVAL_MS", "50"))
+
+
+def _status_kb(field: str):
+    try:
+        with open(_STATUS, "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_bytes() -> int:
+    kb = _status_kb("VmRSS")
+    if kb is not None:
+        return kb * 1024
+    import resource
+    # Not exact on non-Linux, but the best portable approximation
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _pid_rss_kb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _child_pids() -> list:
+    """Direct children of this process (e.g. PDF parsing pool workers); Linux only."""
+    pids = []
+    for children in glob.glob("/proc/self/task/*/children"):
+        try:
+            with open(children, "r") as f:
+                pids.extend(int(pid) for pid in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def tree_rss_bytes() -> int:
+    """RSS of this process plus its child processes."""
+    total = current_rss_bytes()
+    for pid in _child_pids():
+        kb = _pid_rss_kb(pid)
+        if kb is not None:
+            total += kb * 1024
+    return total
+
+
+class PeakRSSTracker:
+    """Samples the RSS of the process and its worker processes while a request runs.
+
+    A background thread samples every MEMORY_SAMPLE_INTERVAL_MS, so `peak` can
+    miss spikes shorter than the interval. Nothing process-wide is reset, so
+    concurrent trackers don't disturb each other; memory used by requests
+    running at the same time is included in each of their peaks.
+    """
+
+    def __init__(self, interval_ms: float = MEMORY_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.start_rss = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        rss = tree_rss_bytes()
+        if rss > self.peak:
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "PeakRSSTracker":
+        self.start_rss = self.peak = tree_rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        """Stops sampling and returns the peak; safe to call more than once."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._sample()
+        return self.peak
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
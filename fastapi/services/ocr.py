@@ -0,0 +1,169 @@
+import io
+import os
+import hashlib
+import importlib.util
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from services.cache import TieredCache, file_sha256
+from services.llm_client import GEMINI_VISION_MODEL, generate_vision_text
+
+logger = logging.getLogger("ocr")
+
+# Bump when the prompt or preprocessing changes so cached OCR results are recomputed
+OCR_PROMPT_VERSION = "1"
+SYLLABUS_PROMPT = (
+    "Extract all visible syllabus text from this image. "
+    "Return only the plain extracted text with no explanation, bullets, or markdown."
+)
+
+# Images are bounded to OCR_MAX_IMAGE_SIDE pixels on the long edge, converted to
+# grayscale and re-encoded as JPEG before being sent for OCR
+OCR_MAX_IMAGE_SIDE = int(os.environ.get("OCR_MAX_IMAGE_SIDE", "1600"))
+OCR_JPEG_QUALITY = int(os.environ.get("OCR_JPEG_QUALITY", "80"))
+OCR_GRAYSCALE = os.environ.get("OCR_GRAYSCALE", "true").lower() == "true"
+
+# "remote" (Gemini vision), "local" (easyocr on CPU) or "local_first" (easyocr,
+# falling back to Gemini when its mean confidence is below OCR_LOCAL_MIN_CONFIDENCE).
+# Without easyocr installed the local backends fall back to Gemini.
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "remote").lower()
+OCR_LOCAL_WORKERS = int(os.environ.get("OCR_LOCAL_WORKERS", "2"))
+OCR_LOCAL_MIN_CONFIDENCE = float(os.environ.get("OCR_LOCAL_MIN_CONFIDENCE", "0.5"))
+OCR_LOCAL_LANGUAGES = os.environ.get("OCR_LOCAL_LANGUAGES", "en").split(",")
+
+OCR_CACHE_TTL_SECONDS = float(os.environ.get("OCR_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+OCR_CACHE_MEMORY_ITEMS = int(os.environ.get("OCR_CACHE_MEMORY_ITEMS", "256"))
+OCR_CACHE_DISK_MB = int(os.environ.get("OCR_CACHE_DISK_MB", "32"))
+ocr_cache = TieredCache(
+    "ocr", OCR_CACHE_MEMORY_ITEMS, OCR_CACHE_DISK_MB * 1024 * 1024, ttl_seconds=OCR_CACHE_TTL_SECONDS
+)
+
+
+def preprocess_image(image_path: str) -> bytes:
+    """Returns the image as downscaled (grayscale) JPEG bytes ready to send for OCR."""
+    with Image.open(image_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("L" if OCR_GRAYSCALE else "RGB")
+        image.thumbnail((OCR_MAX_IMAGE_SIDE, OCR_MAX_IMAGE_SIDE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    data = buffer.getvalue()
+    logger.info(f"Preprocessed '{os.path.basename(image_path)}': "
+                f"{os.path.getsize(image_path)} -> {len(data)} bytes, {image.size[0]}x{image.size[1]}.")
+    return data
+
+
+def ocr_cache_key(image_sha256: str, engine: str) -> str:
+    """Key of an OCR result: image content hash plus everything that shapes the output."""
+    parts = [
+        f"p{OCR_PROMPT_VERSION}",
+        engine,
+        f"{OCR_MAX_IMAGE_SIDE}/{OCR_JPEG_QUALITY}/{int(OCR_GRAYSCALE)}",
+        image_sha256,
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+# --- Local easyocr backend ---
+_reader = None
+_reader_lock = threading.Lock()
+_local_pool = ThreadPoolExecutor(max_workers=OCR_LOCAL_WORKERS, thread_name_prefix="ocr")
+_local_available = None
+
+
+def local_ocr_available() -> bool:
+    """Whether easyocr is installed; logs once when a local backend has to fall back to Gemini."""
+    global _local_available
+    if _local_available is None:
+        _local_available = importlib.util.find_spec("easyocr") is not None
+        if not _local_available:
+            logger.warning(f"OCR_BACKEND '{OCR_BACKEND}' needs easyocr, which is not installed; "
+                           "using Gemini vision OCR instead (pip install easyocr).")
+    return _local_available
+
+
+def _get_reader():
+    """Loads the easyocr reader once per process; model loading takes several seconds."""
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            import easyocr
+
+            logger.info(f"Loading easyocr reader for {OCR_LOCAL_LANGUAGES} on CPU...")
+            _reader = easyocr.Reader(OCR_LOCAL_LANGUAGES, gpu=False)
+        return _reader
+
+
+def _read_local(data: bytes) -> dict:
+    """Runs easyocr over image bytes; confidence is the length-weighted mean over detected lines."""
+    results = _get_reader().readtext(data, detail=1)
+    lines = [(text.strip(), float(conf)) for _, text, conf in results if text.strip()]
+    chars = sum(len(text) for text, _ in lines)
+    confidence = sum(len(text) * conf for text, conf in lines) / chars if chars else 0.0
+    return {"text": "\n".join(text for text, _ in lines), "confidence": confidence}
+
+
+async def _local_ocr(image_sha256: str, image_path: str) -> dict:
+    key = ocr_cache_key(image_sha256, "easyocr")
+    result = ocr_cache.get(key)
+    if result is not None:
+        logger.info(f"Local OCR cache hit for '{os.path.basename(image_path)}'.")
+        return result
+    data = await asyncio.to_thread(preprocess_image, image_path)
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_local_pool, _read_local, data)
+    logger.info(f"Local OCR read {len(result['text'])} chars (confidence {result['confidence']:.2f}).")
+    if result["text"]:
+        ocr_cache.set(key, result)
+    return result
+
+
+async def _remote_ocr(image_sha256: str, image_path: str) -> str:
+    key = ocr_cache_key(image_sha256, GEMINI_VISION_MODEL)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        logger.info(f"OCR cache hit for '{os.path.basename(image_path)}'.")
+        return cached
+    data = await asyncio.to_thread(preprocess_image, image_path)
+    text = await generate_vision_text(SYLLABUS_PROMPT, {"mime_type": "image/jpeg", "data": data})
+    if text:
+        ocr_cache.set(key, text)
+    return text
+
+
+async def extract_syllabus_text(image_path: str, backend: str = None) -> str:
+    """OCRs a syllabus image with the configured backend, cached by image content hash.
+
+    Returns "" when no text is found; empty results are not cached.
+    """
+    backend = (backend or OCR_BACKEND).lower()
+    image_sha256 = await asyncio.to_thread(file_sha256, image_path)
+    if backend in ("local", "local_first") and not local_ocr_available():
+        backend = "remote"
+    if backend == "remote":
+        return await _remote_ocr(image_sha256, image_path)
+    if backend == "local":
+        return (await _local_ocr(image_sha256, image_path))["text"]
+    if backend != "local_first":
+        raise ValueError(f"Unknown OCR_BACKEND '{backend}'")
+
+    local = {"text": "", "confidence": 0.0}
+    try:
+        local = await _local_ocr(image_sha256, image_path)
+    except Exception as e:
+        logger.warning(f"Local OCR failed, using remote: {e!r}")
+    if local["text"] and local["confidence"] >= OCR_LOCAL_MIN_CONFIDENCE:
+        return local["text"]
+
+    logger.info(f"Local OCR confidence {local['confidence']:.2f} below {OCR_LOCAL_MIN_CONFIDENCE}; trying remote.")
+    try:
+        return await _remote_ocr(image_sha256, image_path) or local["text"]
+    except Exception as e:
+        if not local["text"]:
+            raise
+        logger.warning(f"Remote OCR failed, keeping low-confidence local text: {e!r}")
+        return local["text"]
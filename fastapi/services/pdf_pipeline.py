@@ -0,0 +1,178 @@
+import os
+import re
+import math
+import bisect
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("pdf_pipeline")
+
+# Bump when extraction/normalisation/chunking changes so cached documents are rebuilt
+PIPELINE_VERSION = "2"
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Parallel parsing: page ranges are parsed in worker processes that open the file themselves
+PDF_PARSE_WORKERS = int(os.environ.get("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_MIN_PAGES_PER_TASK = int(os.environ.get("PDF_MIN_PAGES_PER_TASK", "16"))
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def normalize_page_text(text: str) -> str:
+    """Normalises line endings, drops NULs and collapses runs of blank lines."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    return _BLANK_LINES.sub("\n\n", text)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started PDF parsing pool with {PDF_PARSE_WORKERS} workers.")
+        return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list:
+    """Worker task: parses pages [start, stop) of the file (0-based)."""
+    with fitz.open(pdf_path) as doc:
+        return [(i + 1, normalize_page_text(doc.load_page(i).get_text())) for i in range(start, stop)]
+
+
+def _iter_pages_serial(pdf_path: str) -> Iterator[Tuple[int, str]]:
+    with fitz.open(pdf_path) as doc:
+        for page_number, page in enumerate(doc, start=1):
+            yield page_number, normalize_page_text(page.get_text())
+
+
+def _iter_pages_parallel(pdf_path: str, page_count: int, workers: int) -> Iterator[Tuple[int, str]]:
+    pages_per_task = max(PDF_MIN_PAGES_PER_TASK, math.ceil(page_count / (workers * 2)))
+    ranges = deque((start, min(start + pages_per_task, page_count))
+                   for start in range(0, page_count, pages_per_task))
+    pool = _get_pool()
+    # Keep at most two ranges per worker in flight so parsed pages cannot pile up
+    in_flight = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers * 2:
+                start, stop = ranges.popleft()
+                in_flight.append(pool.submit(_extract_page_range, pdf_path, start, stop))
+            yield from in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_pdf_pages(pdf_path: str, workers: int = None) -> Iterator[Tuple[int, str]]:
+    """Yields (page_number, normalised_text) in page order, 1-based.
+
+    Documents of at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges parsed across the process pool; smaller ones are parsed serially.
+    """
+    workers = PDF_PARSE_WORKERS if workers is None else workers
+    if workers > 1:
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        if page_count >= PDF_PARALLEL_MIN_PAGES:
+            logger.info(f"Parsing {page_count} pages across {workers} processes.")
+            yield from _iter_pages_parallel(pdf_path, page_count, workers)
+            return
+    yield from _iter_pages_serial(pdf_path)
+
+
+def iter_chunks(pages: Iterable[Tuple[int, str]], chunk_size: int = CHUNK_SIZE,
+                chunk_overlap: int = CHUNK_OVERLAP, page_offsets: list = None) -> Iterator[dict]:
+    """Sliding-window chunker over a page stream.
+
+    Produces the same windows as chunking the concatenated text, but only
+    keeps the current window in memory. Each chunk carries the first and last
+    page it spans. If page_offsets is given, the character offset at which
+    each page starts is appended to it.
+    """
+    buffer = ""
+    buffer_start = 0  # absolute offset of buffer[0]
+    total = 0
+    page_starts = []  # (absolute offset, page number) of pages overlapping the buffer
+    step = chunk_size - chunk_overlap
+
+    def page_at(offset: int) -> int:
+        i = bisect.bisect_right(page_starts, (offset, float("inf"))) - 1
+        return page_starts[max(i, 0)][1]
+
+    def make_chunk(text: str, start: int) -> dict:
+        return {"text": text, "pageStart": page_at(start), "pageEnd": page_at(start + len(text) - 1)}
+
+    for page_number, page_text in pages:
+        if page_offsets is not None:
+            page_offsets.append(total)
+        if not page_text:
+            continue
+        page_starts.append((total, page_number))
+        total += len(page_text)
+        buffer += page_text
+        while len(buffer) > chunk_size:
+            yield make_chunk(buffer[:chunk_size], buffer_start)
+            buffer = buffer[step:]
+            buffer_start += step
+        # Forget pages that ended before the buffer
+        while len(page_starts) > 1 and page_starts[1][0] <= buffer_start:
+            page_starts.pop(0)
+
+    if buffer:
+        yield make_chunk(buffer, buffer_start)
+
+
+def build_document(pdf_path: str) -> dict:
+    """Runs the page -> text -> chunk pipeline, returning chunks and page metadata but not the full text."""
+    page_offsets = []
+    chunks = []
+    chunk_pages = []
+    char_count = 0
+    for i, chunk in enumerate(iter_chunks(iter_pdf_pages(pdf_path), page_offsets=page_offsets)):
+        chunks.append(chunk["text"])
+        chunk_pages.append((chunk["pageStart"], chunk["pageEnd"]))
+        char_count = (i * (CHUNK_SIZE - CHUNK_OVERLAP)) + len(chunk["text"])
+    return {
+        "page_offsets": page_offsets,
+        "page_count": len(page_offsets),
+        "char_count": char_count,
+        "chunks": chunks,
+        "chunk_pages": chunk_pages,
+    }
+
+
+def text_prefix_from_chunks(chunks: list, limit: int, chunk_overlap: int = CHUNK_OVERLAP) -> str:
+    """Rebuilds the first `limit` characters of the document from its overlapping chunks."""
+    parts = []
+    size = 0
+    for i, chunk in enumerate(chunks):
+        part = chunk if i == 0 else chunk[chunk_overlap:]
+        parts.append(part[:limit - size])
+        size += len(parts[-1])
+        if size >= limit:
+            break
+    return "".join(parts)
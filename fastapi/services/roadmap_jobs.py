@@ -0,0 +1,82 @@
+import os
+import asyncio
+import logging
+import traceback
+
+from services.job_store import JobStore
+
+logger = logging.getLogger("roadmap_jobs")
+
+ROADMAP_JOB_WORKERS = int(os.environ.get("ROADMAP_JOB_WORKERS", "2"))
+JOB_KIND = "roadmap"
+
+
+class RoadmapJobQueue:
+    """Runs generate_study_plan jobs in the background on a bounded pool of asyncio workers."""
+
+    def __init__(self, store: JobStore, workers: int = ROADMAP_JOB_WORKERS):
+        self.store = store
+        self._semaphore = asyncio.Semaphore(workers)
+        self._tasks = set()
+
+    async def submit(self, pdf_path, syllabus_path, owned_paths: list,
+                     use_cache: bool = True, force_refresh: bool = False) -> tuple:
+        """Queues a job (or joins an identical one); returns (job, created).
+
+        owned_paths are temp files the job deletes when it finishes; they are
+        deleted immediately when the request is deduplicated onto another job.
+        Finished jobs are reused like roadmap cache entries: only while the cache
+        is enabled and for up to ROADMAP_CACHE_TTL_SECONDS. Without use_cache, or
+        with force_refresh, only in-flight jobs are joined.
+        """
+        from gemini_advanced import ROADMAP_CACHE_ENABLED, ROADMAP_CACHE_TTL_SECONDS, roadmap_cache_key
+
+        # Same key as the roadmap cache, so a prompt, model or pipeline change invalidates both
+        content_hash = await asyncio.to_thread(roadmap_cache_key, pdf_path, syllabus_path)
+        reuse_succeeded = use_cache and not force_refresh and ROADMAP_CACHE_ENABLED
+        job, created = self.store.create_or_get(
+            JOB_KIND, content_hash, reuse_succeeded=reuse_succeeded,
+            succeeded_max_age=ROADMAP_CACHE_TTL_SECONDS,
+        )
+        if not created:
+            logger.info(f"Roadmap request deduplicated onto job {job['id']} ({job['status']}).")
+            _remove_files(owned_paths)
+            return job, False
+        task = asyncio.create_task(self._run(
+            job["id"], pdf_path, syllabus_path, owned_paths, use_cache, force_refresh
+        ))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job, True
+
+    async def _run(self, job_id, pdf_path, syllabus_path, owned_paths, use_cache, force_refresh) -> None:
+        from gemini_advanced import generate_study_plan
+
+        def progress(step, message):
+            self.store.add_event(job_id, f"step{step}", message)
+
+        try:
+            async with self._semaphore:
+                self.store.set_status(job_id, "running")
+                result = await generate_study_plan(
+                    pdf_path, syllabus_path, progress=progress,
+                    use_cache=use_cache, force_refresh=force_refresh,
+                )
+            if not result:
+                # build_study_plan returns {} when the model output could not be parsed
+                raise ValueError("Roadmap generation produced no units; the model output could not be parsed")
+            # Events first: /events stops at a terminal status and must not miss the last one
+            self.store.add_event(job_id, "done", "Roadmap generated successfully")
+            self.store.set_status(job_id, "succeeded", result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.add_event(job_id, "failed", str(e))
+            self.store.set_status(job_id, "failed", error=str(e))
+        finally:
+            _remove_files(owned_paths)
+
+
+def _remove_files(paths) -> None:
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
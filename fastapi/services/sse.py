@@ -0,0 +1,143 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger("sse")
+
+# Tokens are buffered for up to SSE_FLUSH_MS (or SSE_FLUSH_MAX_CHARS) and sent as one event
+SSE_FLUSH_MS = float(os.environ.get("SSE_FLUSH_MS", "40"))
+SSE_FLUSH_MAX_CHARS = int(os.environ.get("SSE_FLUSH_MAX_CHARS", "256"))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_DISCONNECT_POLL_SECONDS = float(os.environ.get("SSE_DISCONNECT_POLL_SECONDS", "0.25"))
+
+_DONE = object()
+
+
+def sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class StreamMetrics:
+    """Counters for token streams; tokens are upstream stream chunks (about one token each)."""
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.abandoned = 0
+        self.tokens_streamed = 0
+        self.events_sent = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def record(self, outcome: str, tokens: int, events: int, max_tokens: Optional[int]) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.tokens_streamed += tokens
+            self.events_sent += events
+            if outcome == "abandoned" and max_tokens:
+                self.tokens_saved += max(max_tokens - tokens, 0)
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "tokensStreamed": self.tokens_streamed,
+            "eventsSent": self.events_sent,
+            # Upper bound: completion budget left unused when streams were cut off
+            "tokensSavedEstimate": self.tokens_saved,
+        }
+
+
+async def stream_tokens_as_sse(request, tokens: AsyncIterator[str], metrics: StreamMetrics,
+                               max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+    """Relays an async token stream as SSE events.
+
+    Tokens are coalesced into small flush windows, a comment heartbeat is sent
+    during silences, and the client connection is polled: on disconnect the
+    upstream stream is cancelled, which closes the LLM response and stops
+    generation. Ends with {"done": true}, or {"error": ...} on failure.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for token in tokens:
+                await queue.put(token)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(e)
+
+    metrics.start()
+    pump_task = asyncio.create_task(pump())
+    buffer = []
+    buffered_chars = 0
+    flush_at = 0.0
+    last_sent = loop.time()
+    next_poll = loop.time()
+    token_count = 0
+    event_count = 0
+    outcome = "abandoned"
+    try:
+        while True:
+            now = loop.time()
+            if now >= next_poll:
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected after {token_count} tokens; cancelling upstream stream.")
+                    return
+                next_poll = now + SSE_DISCONNECT_POLL_SECONDS
+
+            deadline = min(next_poll, flush_at if buffer else last_sent + SSE_HEARTBEAT_SECONDS)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _DONE or isinstance(item, Exception):
+                if buffer:
+                    yield sse_event({"token": "".join(buffer)})
+                    event_count += 1
+                if item is _DONE:
+                    yield sse_event({"done": True})
+                    outcome = "completed"
+                else:
+                    logger.error(f"Error in token stream: {item}")
+                    yield sse_event({"error": str(item)})
+                    outcome = "failed"
+                return
+
+            now = loop.time()
+            if item is not None:
+                token_count += 1
+                if item:
+                    if not buffer:
+                        # The first token goes out at once; later ones wait for the window
+                        flush_at = now if event_count == 0 else now + SSE_FLUSH_MS / 1000
+                    buffer.append(item)
+                    buffered_chars += len(item)
+
+            if buffer and (now >= flush_at or buffered_chars >= SSE_FLUSH_MAX_CHARS):
+                yield sse_event({"token": "".join(buffer)})
+                event_count += 1
+                buffer, buffered_chars, last_sent = [], 0, now
+            elif not buffer and now - last_sent >= SSE_HEARTBEAT_SECONDS:
+                yield ": ping\n\n"
+                last_sent = now
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+            try:
+                await pump_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        metrics.record(outcome, token_count, event_count, max_tokens)
@@ -1,8 +1,11 @@
 import os
+import re
 import logging
 from dotenv import load_dotenv
 from tavily import TavilyClient
 
+from services.cache import LRUCache
+
 # Load environment variables
 load_dotenv()
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
@@ -10,6 +13,11 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
 logger = logging.getLogger("tavily_service")
 
 TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY", "")
+TAVILY_CACHE_TTL_SECONDS = float(os.environ.get("TAVILY_CACHE_TTL_SECONDS", str(6 * 3600)))
+TAVILY_CACHE_SIZE = int(os.environ.get("TAVILY_CACHE_SIZE", "512"))
+
+# Web results per normalized query; failed or empty searches are not cached
+_search_cache = LRUCache(max_items=TAVILY_CACHE_SIZE, ttl_seconds=TAVILY_CACHE_TTL_SECONDS)
 
 # Initialize client
 _tavily_client = None
@@ -22,11 +30,20 @@ if TAVILY_API_KEY:
 else:
     logger.warn("TAVILY_API_KEY is not defined in environment variables. Web search fallback will be unavailable.")
 
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
 def search_web(query: str) -> list:
     global _tavily_client
     if not _tavily_client:
         logger.warn("Tavily client is not initialized. Web search bypassed.")
         return []
+
+    key = normalize_query(query)
+    cached = _search_cache.get(key)
+    if cached is not None:
+        logger.info(f"Tavily cache hit for query: '{query}'")
+        return cached
         
     logger.info(f"Calling Tavily Web Search API for query: '{query}'")
     try:
@@ -41,7 +58,12 @@ def search_web(query: str) -> list:
                 "url": r.get("url", "")
             })
         logger.info(f"Tavily Search completed. Found {len(web_results)} results.")
+        if web_results:
+            _search_cache.set(key, web_results)
         return web_results
     except Exception as e:
         logger.error(f"Tavily API search failed: {e}")
         return []
+
+def web_search_cache_stats() -> dict:
+    return _search_cache.stats()
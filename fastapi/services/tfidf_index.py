@@ -0,0 +1,81 @@
+import re
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+# Same tokenisation and smoothed IDF as sklearn's TfidfVectorizer defaults
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _term_counts(texts, vocabulary: dict, grow: bool):
+    """Builds a CSR term-count matrix, optionally adding unseen terms to the vocabulary."""
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        counts = Counter()
+        for token in tokenize(text):
+            term_id = vocabulary.get(token)
+            if term_id is None:
+                if not grow:
+                    continue
+                term_id = vocabulary[token] = len(vocabulary)
+            counts[term_id] += 1
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    return sp.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), len(vocabulary)),
+    )
+
+
+def _l2_normalize_rows(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.diags(1.0 / norms).dot(matrix).tocsr()
+
+
+class TfidfIndex:
+    """Prebuilt TF-IDF index over a document's chunks: vocabulary, IDF vector and L2-normalised CSR matrix."""
+
+    def __init__(self, vocabulary: dict, idf: np.ndarray, matrix: sp.csr_matrix):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, chunks: list) -> "TfidfIndex":
+        vocabulary = {}
+        counts = _term_counts(chunks, vocabulary, grow=True)
+        n_docs = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        matrix = _l2_normalize_rows(counts.dot(sp.diags(idf)).tocsr())
+        return cls(vocabulary, idf, matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def transform(self, text: str) -> sp.csr_matrix:
+        """Projects a query onto the index vocabulary as an L2-normalised row vector."""
+        counts = _term_counts([text], self.vocabulary, grow=False)
+        return _l2_normalize_rows(counts.dot(sp.diags(self.idf)).tocsr())
+
+    def query(self, text: str, top_k: int = 5) -> list:
+        """Returns (chunk_index, cosine_score) pairs for the top_k chunks, best first."""
+        n_chunks = len(self)
+        if n_chunks == 0 or top_k <= 0:
+            return []
+        scores = self.matrix.dot(self.transform(text).T).toarray().ravel()
+        if top_k < n_chunks:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(n_chunks)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
@@ -0,0 +1,133 @@
+import os
+import re
+import logging
+import threading
+from dotenv import load_dotenv
+
+from services.cache import LRUCache
+
+# Load environment variables
+load_dotenv()
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+logger = logging.getLogger("youtube_service")
+
+YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
+YOUTUBE_CACHE_TTL_SECONDS = float(os.environ.get("YOUTUBE_CACHE_TTL_SECONDS", str(24 * 3600)))
+YOUTUBE_CACHE_SIZE = int(os.environ.get("YOUTUBE_CACHE_SIZE", "1024"))
+
+_video_cache = LRUCache(max_items=YOUTUBE_CACHE_SIZE, ttl_seconds=YOUTUBE_CACHE_TTL_SECONDS)
+
+_youtube = None
+_youtube_lock = threading.Lock()
+_http_local = threading.local()
+
+
+def _build_request(http, *args, **kwargs):
+    # The discovery client is shared, but httplib2.Http is not thread-safe:
+    # give every thread its own connection instead
+    import httplib2
+    from googleapiclient.http import HttpRequest
+
+    if not hasattr(_http_local, "http"):
+        _http_local.http = httplib2.Http()
+    return HttpRequest(_http_local.http, *args, **kwargs)
+
+
+def _get_youtube():
+    """Builds the YouTube Data API client once per process."""
+    global _youtube
+    with _youtube_lock:
+        if _youtube is None:
+            from googleapiclient.discovery import build
+
+            _youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY,
+                             requestBuilder=_build_request, cache_discovery=False)
+        return _youtube
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+def _format_duration(duration: str) -> str:
+    # ISO 8601 format (e.g., PT15M33S), simple approximation
+    duration = duration.replace("PT", "").replace("H", ":").replace("M", ":").replace("S", "")
+    if ":" not in duration:  # If only seconds
+        duration = f"0:{duration}"
+    return duration
+
+
+def _format_view_count(view_count: str) -> str:
+    try:
+        views = int(view_count)
+        if views >= 1000000:
+            return f"{views/1000000:.1f}M"
+        if views >= 1000:
+            return f"{views/1000:.1f}K"
+    except (TypeError, ValueError):
+        pass
+    return view_count
+
+
+def search_youtube_videos(query, max_results=3):
+    """Searches for YouTube videos related to the query.
+
+    Costs two API calls (search + one batched videos lookup); results are
+    cached per normalized query for YOUTUBE_CACHE_TTL_SECONDS.
+    """
+    if not YOUTUBE_API_KEY:
+        logger.warning("YOUTUBE_API_KEY not found.")
+        return []
+
+    key = (normalize_query(query), max_results)
+    cached = _video_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        youtube = _get_youtube()
+        search_response = youtube.search().list(
+            q=query,
+            type="video",
+            part="id,snippet",
+            maxResults=max_results,
+            relevanceLanguage="en"
+        ).execute()
+        search_results = search_response.get("items", [])
+        if not search_results:
+            _video_cache.set(key, [])
+            return []
+
+        # Get duration and view count for every result in one call
+        video_ids = [result["id"]["videoId"] for result in search_results]
+        video_response = youtube.videos().list(
+            id=",".join(video_ids),
+            part="contentDetails,statistics"
+        ).execute()
+        details = {item["id"]: item for item in video_response.get("items", [])}
+
+        videos = []
+        for search_result in search_results:
+            video_id = search_result["id"]["videoId"]
+            video_details = details.get(video_id)
+            if not video_details:
+                continue
+            videos.append({
+                "videoId": video_id,
+                "title": search_result["snippet"]["title"],
+                "thumbnail": search_result["snippet"]["thumbnails"]["medium"]["url"],
+                "channelName": search_result["snippet"]["channelTitle"],
+                "duration": _format_duration(video_details["contentDetails"]["duration"]),
+                "viewCount": f"{_format_view_count(video_details['statistics'].get('viewCount', '0'))} views"
+            })
+
+        _video_cache.set(key, videos)
+        return videos
+    except Exception as e:
+        logger.error(f"Error searching YouTube: {e}")
+        return []
+
+
+def youtube_cache_stats() -> dict:
+    return _video_cache.stats()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.context_builder import dedupe_chunks
+
+
+def test_dedupe_trims_chunker_overlap():
+    shared = "x" * 100
+    chunks = [{"text": "first part " + shared}, {"text": shared + " second part"}]
+    kept = dedupe_chunks(chunks)
+    assert [c["text"] for c in kept] == ["first part " + shared, " second part"]
+
+
+def test_dedupe_keeps_single_character_overlap():
+    chunks = [{"text": "Trees are traversed level by level T"}, {"text": "Topic: Sorting algorithms"}]
+    kept = dedupe_chunks(chunks)
+    assert [c["text"] for c in kept] == [c["text"] for c in chunks]
+
+
+def test_dedupe_drops_repeated_chunks():
+    chunks = [{"text": "Heaps keep the minimum at the root."}, {"text": "Heaps keep the minimum at the root."}]
+    assert len(dedupe_chunks(chunks)) == 1
@@ -0,0 +1,85 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("dotenv")
+
+from services.llm_client import ChatProvider, FakeProvider, LLMClient
+
+MODELS = ["primary-model", "fallback-model"]
+MESSAGES = [{"role": "user", "content": "what is a heap"}]
+
+
+async def collect(tokens) -> list:
+    return [token async for token in tokens]
+
+
+class MidStreamFailure(FakeProvider):
+    """Emits one token, then fails."""
+
+    async def stream(self, model, messages, temperature, max_tokens):
+        self.calls.append(model)
+        yield "partial "
+        raise RuntimeError("connection dropped")
+
+
+def test_chat_provider_is_abstract():
+    with pytest.raises(TypeError):
+        ChatProvider(1, 1.0)
+
+
+def test_complete_uses_primary_model():
+    provider = FakeProvider(response="answer")
+    client = LLMClient(provider, models=MODELS)
+    assert asyncio.run(client.complete(MESSAGES)) == "answer"
+    assert provider.calls == ["primary-model"]
+
+
+def test_complete_falls_back_when_primary_fails():
+    provider = FakeProvider(response="answer", fail_models=["primary-model"])
+    client = LLMClient(provider, models=MODELS)
+    assert asyncio.run(client.complete(MESSAGES)) == "answer"
+    assert provider.calls == MODELS
+
+
+def test_complete_raises_when_every_model_fails():
+    provider = FakeProvider(fail_models=MODELS)
+    client = LLMClient(provider, models=MODELS)
+    with pytest.raises(RuntimeError):
+        asyncio.run(client.complete(MESSAGES))
+    assert provider.calls == MODELS
+
+
+def test_stream_yields_provider_tokens():
+    provider = FakeProvider(response="a heap is a tree")
+    client = LLMClient(provider, models=MODELS)
+    tokens = asyncio.run(collect(client.stream(MESSAGES)))
+    assert "".join(tokens).strip() == "a heap is a tree"
+    assert provider.calls == ["primary-model"]
+
+
+def test_stream_falls_back_before_first_token():
+    provider = FakeProvider(response="from fallback", fail_models=["primary-model"])
+    client = LLMClient(provider, models=MODELS)
+    tokens = asyncio.run(collect(client.stream(MESSAGES)))
+    assert "".join(tokens).strip() == "from fallback"
+    assert provider.calls == MODELS
+
+
+def test_stream_does_not_fall_back_after_emitting():
+    provider = MidStreamFailure()
+    client = LLMClient(provider, models=MODELS)
+    received = []
+
+    async def consume():
+        async for token in client.stream(MESSAGES):
+            received.append(token)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert received == ["partial "]
+    assert provider.calls == ["primary-model"]
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.generativeai")
+
+from rag.bm25_index import BM25Index
+from rag.retriever import LEXICAL_CONFIDENCE_BOOST, fuse_results
+
+# Default the doubt solver compares retrieval confidence against before using the web
+RAG_SIMILARITY_THRESHOLD = 0.65
+
+TEXTS = [
+    "Dijkstra algorithm finds shortest paths from a source in a weighted graph.",
+    "Binary heaps support insert and extract-min in logarithmic time.",
+    "Breadth-first search visits a graph level by level.",
+]
+IDS = ["c0", "c1", "c2"]
+METADATA = [{"unitIndex": 0, "topicIndex": i} for i in range(len(TEXTS))]
+
+
+def dense_hit(row: int, score: float) -> dict:
+    return {"id": IDS[row], "text": TEXTS[row], "metadata": METADATA[row], "score": score}
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(IDS, TEXTS, METADATA)
+
+
+def test_full_lexical_coverage_does_not_clear_threshold(index):
+    results = fuse_results("explain dijkstra algorithm", [dense_hit(0, 0.4)], index, top_k=2)
+    best = next(r for r in results if r["id"] == "c0")
+    assert best["confidence"] == pytest.approx(0.4 + LEXICAL_CONFIDENCE_BOOST, abs=1e-6)
+    assert best["confidence"] < RAG_SIMILARITY_THRESHOLD
+
+
+def test_lexical_only_hit_stays_below_threshold(index):
+    results = fuse_results("explain dijkstra algorithm", [dense_hit(1, 0.2)], index, top_k=2)
+    lexical_only = next(r for r in results if r["id"] == "c0")
+    assert lexical_only["score"] == 0.0
+    assert lexical_only["confidence"] < RAG_SIMILARITY_THRESHOLD
+
+
+def test_confidence_follows_dense_score_without_lexical_match(index):
+    results = fuse_results("priority queue", [dense_hit(1, 0.7)], index, top_k=1)
+    assert results[0]["confidence"] == pytest.approx(0.7)